@@ -1,19 +1,37 @@
+import atexit
 import uuid
-from flask import Flask, abort, redirect, render_template, request, url_for, flash, jsonify, session, blueprints
+import gzip
+import json
+from flask import Flask, abort, redirect, render_template, request, url_for, flash, jsonify, session, blueprints, make_response
 from flask_wtf.file import FileField, FileAllowed
 
 # from flask_wtf import FileField
 # Market Data
-import yfinance as yf
 
 # Server Setup
-from flask_socketio import SocketIO, emit, send
+from flask_socketio import SocketIO, emit, send, join_room, leave_room
 from threading import Lock
 from flask_bcrypt import Bcrypt
 import os
 from dotenv import load_dotenv
 from src.repositories.post_repository import post_repository_singleton
 from src.repositories.user_repository import user_repository_singleton
+from src.repositories.like_counter_buffer import like_counter_buffer_singleton
+from src.repositories.timeline_repository import timeline_repository_singleton
+from src.market_data.subscriptions import TooManySubscriptions, subscription_manager_singleton
+from src.market_data.cache import market_data_cache_singleton
+from src.market_data.bar_store import bar_store_singleton, bars_to_frame, frame_to_records
+from src.market_data.resample import RESOLUTIONS, downsample_bars
+from src.market_data.wire import CHART_FORMATS, to_binary, to_columnar
+from src.market_data.ticks import tick_publisher_singleton
+from src.market_data.aggregator import bar_aggregator_singleton, session_start
+from src.market_data.indicators import indicator_engine_singleton, parse_study
+from src.market_data.scheduler import poll_scheduler_singleton
+from src.market_data.warmer import CacheWarmer
+from src.market_data.replay import MARKET_DATA_MODE, REPLAY_SPEED, TickReplayer, tick_recorder_singleton
+from src.market_data.symbols import DEFAULT_RESULTS, MAX_RESULTS, symbol_index_singleton
+from src.market_data.executor import FETCH_TIMEOUT, MarketDataTimeout, MarketDataUnavailable
+from src.market_data.quotes import MAX_QUOTE_SYMBOLS, QUOTE_INTERVAL, QUOTE_PERIOD, get_quotes, quote_from_history
 from sqlalchemy import or_, func
 from flask_mail import Mail, Message
 from src.models import db, users, live_posts, Post, friendships
@@ -82,51 +100,89 @@ mail = Mail(app)
 code = 0
 temp_user_info = []
 
-# Override Yahoo Finance
-yf.pdr_override()
-global current_symbol
 
-def background_thread():
-    print("Generating random sensor values")
-    global current_symbol
-    ticker = current_symbol
-    while True:
-        symbol = yf.Ticker(ticker)
-        df = symbol.history(period='1d', interval='1m')
-
-        last_close_price = correct_graph_cols(df.tail(2))
-        df = correct_graph_cols(df.tail(1))
-        
-        # time = df.iloc[-1]['date']
-
-        open = last_close_price.iloc[-2]['close']
-
-        if 'high' in locals() and high < df.iloc[-1]['high']:
-            high = df.iloc[-1]['high']
-        elif 'high' not in locals():
-            high = df.iloc[-1]['high']
-
-        if 'low' in locals() and low > df.iloc[-1]['low']:
-            low = df.iloc[-1]['low']
-        elif 'low' not in locals():
-            low = df.iloc[-1]['low']
-
-        close = df.iloc[-1]['close']
-
-        df.loc[0,'open'] = open
-        df.loc[0,'high'] = high
-        df.loc[0,'low'] = low
-        df.loc[0,'close'] = close
-        
-        if ticker == current_symbol:
-            socketio.emit('updateSensorData', {'value': df.to_json()})
+# Default chart symbol shown on the home page
+DEFAULT_SYMBOL = 'SPY'
+
+# Longest a poller sleeps in one go before checking it still has subscribers,
+# and seconds between two flushes of queued ticks
+POLL_SECONDS = 5
+TICK_FLUSH_SECONDS = 1
+# a replay faster than real time flushes faster too, as fast as possible flushes every 10ms
+# (a timer, not sleep(0), so the event loop still gets to serve sockets)
+if MARKET_DATA_MODE == 'replay':
+    TICK_FLUSH_SECONDS = TICK_FLUSH_SECONDS / REPLAY_SPEED if REPLAY_SPEED > 0 else 0.01
+
+# sleep until the next poll of a symbol, waking early when nobody watches it anymore
+def wait_for_next_poll(ticker, delay):
+    while delay > 0 and subscription_manager_singleton.subscriber_count(ticker):
+        socketio.sleep(min(delay, POLL_SECONDS))
+        delay -= POLL_SECONDS
+
+# One poller runs per watched symbol, it folds new 1m bars from the bar store
+# into the streaming aggregator and publishes the live 1m bar.
+# The scheduler decides how often it polls (market hours, backoff after errors),
+# and it stops on its own once the last subscriber has left.
+def background_thread(ticker):
+    print(f"Starting poller for {ticker}")
+    # time of the last bar folded into the aggregator, it is folded again on the
+    # next cycle because it may still be forming
+    fed = None
+    while subscription_manager_singleton.keep_polling(ticker):
+        try:
+            refreshed = bar_store_singleton.refresh(ticker, timeout=FETCH_TIMEOUT)
+        except MarketDataUnavailable as e:
+            print(f"Poll failed for {ticker}: {e}")
+            refreshed = False
+        if refreshed:
+            poll_scheduler_singleton.record_success(ticker)
         else:
-            del open
-            del high
-            del low
-            del close
-        ticker = current_symbol
-        socketio.sleep(5)
+            poll_scheduler_singleton.record_failure(ticker)
+        if fed is None:
+            last = bar_store_singleton.tail(ticker, 1)
+            if len(last):
+                fed = session_start(int(last['t'][0]))
+
+        if fed is not None:
+            new_bars = bar_store_singleton.since(ticker, fed)
+            for bar in new_bars:
+                fed = int(bar['t'])
+                bar_aggregator_singleton.add_bar(ticker, fed, float(bar['open']), float(bar['high']),
+                                                 float(bar['low']), float(bar['close']), float(bar['volume']))
+            indicator_engine_singleton.advance(ticker, '1m', new_bars)
+
+            live = bar_aggregator_singleton.current(ticker, '1m')
+            if live is not None:
+                tick_publisher_singleton.publish(ticker, live)
+                if MARKET_DATA_MODE == 'capture':
+                    tick_recorder_singleton.record(ticker, live)
+        wait_for_next_poll(ticker, poll_scheduler_singleton.next_delay(ticker))
+    poll_scheduler_singleton.forget(ticker)
+    tick_publisher_singleton.forget(ticker)
+    bar_aggregator_singleton.reset(ticker)
+    print(f"Stopped poller for {ticker}")
+
+# Replay mode stand-in for background_thread: plays the recorded live bars of a symbol
+# (MARKET_DATA_MODE=capture) into the same publisher, so clients cannot tell the difference
+tick_replayer = TickReplayer(sleep=socketio.sleep)
+
+def replay_thread(ticker):
+    print(f"Starting replay for {ticker}")
+    keep_going = lambda: subscription_manager_singleton.keep_polling(ticker)
+    tick_replayer.replay(ticker, tick_publisher_singleton.publish, keep_going)
+    # the recording ran out, hold the symbol's slot until its subscribers leave
+    while keep_going():
+        socketio.sleep(POLL_SECONDS)
+    tick_publisher_singleton.forget(ticker)
+    print(f"Stopped replay for {ticker}")
+
+# Sends the ticks queued by all pollers, one frame per symbol room per cycle.
+# A frame only exists when a bar actually changed and only carries the changed fields.
+def flush_ticks():
+    while True:
+        for symbol, ticks in tick_publisher_singleton.drain().items():
+            socketio.emit('updateSensorData', {'symbol': symbol, 'ticks': ticks}, to=symbol)
+        socketio.sleep(TICK_FLUSH_SECONDS)
 
 
 def correct_graph_cols(df):
@@ -134,44 +190,169 @@ def correct_graph_cols(df):
     df.columns = df.columns.str.lower()
     return df.rename(columns={"datetime": "date"})
 
-# Retrieve stock data frame (df) from yfinance API at an interval of 1m
+# Retrieve stock data frame (df) of 1m bars from the local bar store,
+# only bars newer than the last stored one are fetched from yfinance
 def previous_graph(ticker):
-
-    global current_symbol
-    current_symbol = ticker
-    print(current_symbol)
-    symbol = yf.Ticker(ticker)
-    df = symbol.history(period='5d', interval='1m')
-    return correct_graph_cols(df)
+    refresh_bars(ticker)
+    return bar_store_singleton.get_frame(ticker, refresh=False)
+
+# Bring a symbol's bars up to date without letting a slow upstream hold the request:
+# past the deadline (or with every market data worker busy) the stored bars are served as they are.
+# A replay stays offline and deterministic, charts are drawn from the stored bars only.
+def refresh_bars(symbol):
+    if MARKET_DATA_MODE == 'replay':
+        return
+    try:
+        bar_store_singleton.refresh(symbol, timeout=FETCH_TIMEOUT)
+    except MarketDataUnavailable as e:
+        if not len(bar_store_singleton.tail(symbol, 1)):
+            market_data_abort(e)
+
+# 504 when the upstream was too slow, 503 when we are shedding load
+def market_data_abort(e):
+    abort(504 if isinstance(e, MarketDataTimeout) else 503)
 
 @app.get('/')
 def index():
     return render_template('index.html', user=session.get('user'))
 
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+# Chart data of a ticker, downsampled when the query string asks for it:
+# ?resolution=5m picks the bucket size, ?max_points=300 picks the finest bucket size that fits
+# ?format=records|columnar|binary picks the wire format (see src/market_data/wire.py)
+def chart_data(ticker):
+    resolution = request.args.get('resolution')
+    max_points = request.args.get('max_points', type=int)
+    format = request.args.get('format', 'records')
+    if resolution is not None and resolution not in RESOLUTIONS:
+        abort(400)
+    if max_points is not None and max_points < 1:
+        abort(400)
+    if format not in CHART_FORMATS:
+        abort(400)
+
+    df = downsample_bars(previous_graph(ticker), resolution, max_points)
+    if format == 'binary':
+        response = make_response(to_binary(df))
+        response.mimetype = 'application/octet-stream'
+    elif format == 'columnar':
+        response = make_response(json.dumps(to_columnar(df)))
+        response.mimetype = 'application/json'
+    else:
+        response = make_response(df.to_json(orient='records'))
+        response.mimetype = 'application/json'
+    return compress_response(response)
+
+# ETag + conditional GET, then gzip for clients that accept it
+def compress_response(response):
+    # weak, because the gzip and identity encodings of one body share the tag
+    response.add_etag(weak=True)
+    response.make_conditional(request)
+    response.vary.add('Accept-Encoding')
+    if response.status_code == 200 and 'gzip' in request.accept_encodings and response.content_length >= GZIP_MIN_SIZE:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 @app.get('/data')
 def data(): 
-    ticker = 'SPY'
-    
-    df = previous_graph(ticker)
-    return df.to_json(orient='records')
+    ticker = DEFAULT_SYMBOL
+    return chart_data(ticker)
 
 @app.post('/data')
 def set_data():
+    ticker = DEFAULT_SYMBOL
     jsonData = request.get_json()
     if jsonData != None:
-        ticker = jsonData['Stock']
+        ticker = request_symbol(jsonData.get('Stock'))
+    return chart_data(ticker)
+
+# a ticker sent by the client, 400 for anything that is not one
+def request_symbol(symbol):
+    symbol = subscription_manager_singleton.normalize(symbol)
+    if symbol is None:
+        abort(400)
+    return symbol
+
+# Technical indicators of a symbol's bars, e.g.
+# /indicators?symbol=SPY&resolution=5m&studies=sma:20,ema:50,rsi:14,macd:12:26:9,bbands:20:2,vwap
+# returns {'symbol', 'resolution', 'studies': {study: {'t': [...], output: [...]}}}
+@app.get('/indicators')
+def indicators():
+    symbol = request_symbol(request.args.get('symbol', DEFAULT_SYMBOL))
+    resolution = request.args.get('resolution', '1m')
+    studies = [study for study in request.args.get('studies', '').split(',') if study.strip()]
+    if resolution not in RESOLUTIONS or not studies:
+        abort(400)
+    try:
+        parsed = {study.strip().lower(): parse_study(study) for study in studies}
+    except ValueError:
+        abort(400)
 
-    df = previous_graph(ticker)
-    return df.to_json(orient='records')
+    refresh_bars(symbol)
+    full = None
+    result = {}
+    for study, (name, params) in parsed.items():
+        bars = None
+        last = indicator_engine_singleton.last_time(symbol, resolution, name, params)
+        if last is not None and resolution == '1m':
+            # a cached 1m series only needs the bars from its last one on
+            bars = bar_store_singleton.since(symbol, last)
+            if not len(bars) or int(bars['t'][0]) != last:
+                bars = None
+        if bars is None:
+            if full is None:
+                full = indicator_bars(symbol, resolution)
+            bars = full
+        result[study] = indicator_engine_singleton.get(symbol, resolution, name, params, bars)
+    return jsonify({'symbol': symbol, 'resolution': resolution, 'studies': result})
+
+def indicator_bars(symbol, resolution):
+    bars = bar_store_singleton.get_bars(symbol, refresh=False)
+    if resolution == '1m':
+        return bars
+    return frame_to_records(downsample_bars(bars_to_frame(bars), resolution))
 
 @app.post('/display_watchlist')
 def display_watchlist():
     ticker = request.get_json()['ticker']
-    print(ticker)
-    data = yf.Ticker(ticker).history(period='1y')
-    print(data.iloc[-1].Open)
-    return jsonify({'currentPrice': data.iloc[-1].Close,
-                    'openPrice':data.iloc[-1].Open})
+    try:
+        quote = quote_from_history(market_data_cache_singleton.get_history(ticker, QUOTE_PERIOD, QUOTE_INTERVAL))
+    except MarketDataUnavailable as e:
+        market_data_abort(e)
+    if quote is None:
+        abort(404)
+    return jsonify(quote)
+
+# current price and open for a whole watchlist in one round trip
+@app.post('/quotes')
+def quotes():
+    jsonData = request.get_json(silent=True) or {}
+    symbols = jsonData.get('symbols')
+    if not isinstance(symbols, list) or len(symbols) > MAX_QUOTE_SYMBOLS:
+        abort(400)
+    symbols = [symbol for symbol in symbols if isinstance(symbol, str) and symbol.strip()]
+    if not symbols:
+        return jsonify({'quotes': {}})
+    return jsonify({'quotes': get_quotes(symbols)})
+
+# Ticker autocomplete, e.g. /symbols/search?q=app&limit=10
+# returns {'results': [{'symbol', 'name'}]}, best matches and most watched tickers first
+@app.get('/symbols/search')
+def search_symbols():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', DEFAULT_RESULTS, type=int)
+    if limit < 1:
+        abort(400)
+    return jsonify({'results': symbol_index_singleton.search(query, min(limit, MAX_RESULTS))})
+
+def watch_counts():
+    with app.app_context():
+        return user_repository_singleton.get_watch_counts()
+
+symbol_index_singleton.set_popularity_loader(watch_counts)
 
 @app.post('/add_to_watchlist')
 def add_to_watchlist():
@@ -552,15 +733,41 @@ def handle_message(message):
 
 @socketio.on('connect')
 def connect():
-    global thread
-    print('Server connected')
-    global current_symbol
-    current_symbol = 'SPY'
+    print('Server connected', request.sid)
+
+# join the room of a symbol and make sure a poller is running for it
+@socketio.on('subscribe')
+def subscribe(data):
+    symbol = subscription_manager_singleton.normalize((data or {}).get('symbol'))
+    if symbol is None:
+        return
+    try:
+        start_poller = subscription_manager_singleton.subscribe(request.sid, symbol)
+    except TooManySubscriptions as e:
+        print(f'Subscription to {symbol} refused: {e}')
+        return
+    join_room(symbol)
+    if start_poller:
+        poller = replay_thread if MARKET_DATA_MODE == 'replay' else background_thread
+        socketio.start_background_task(poller, symbol)
 
     global thread
     with thread_lock:
         if thread is None:
-            thread = socketio.start_background_task(background_thread)
+            thread = socketio.start_background_task(flush_ticks)
+
+    # ticks only carry changes, so a new subscriber starts from the full live bar
+    snapshot = tick_publisher_singleton.snapshot(symbol)
+    if snapshot is not None:
+        emit('updateSensorData', {'symbol': symbol, 'ticks': [snapshot]})
+
+@socketio.on('unsubscribe')
+def unsubscribe(data):
+    symbol = subscription_manager_singleton.normalize((data or {}).get('symbol'))
+    if symbol is None:
+        return
+    leave_room(symbol)
+    subscription_manager_singleton.unsubscribe(request.sid, symbol)
 
 """
 Decorator for disconnect
@@ -568,8 +775,44 @@ Decorator for disconnect
 
 @socketio.on('disconnect')
 def disconnect():
+    # rooms are left automatically, pollers notice the missing subscribers on their next cycle
+    subscription_manager_singleton.remove_client(request.sid)
     print('Client disconnected',  request.sid)
 
 
+# Warm the market data of the most watched tickers at startup and then periodically,
+# CACHE_WARMER=off turns it off (tests, local work without network), replays never warm
+def most_watched_symbols(limit):
+    with app.app_context():
+        return user_repository_singleton.get_most_watched(limit)
+
+cache_warmer = CacheWarmer(most_watched_symbols, sleep=socketio.sleep)
+if os.getenv('CACHE_WARMER', 'on') != 'off' and MARKET_DATA_MODE != 'replay':
+    socketio.start_background_task(cache_warmer.run)
+
+
+# Write buffered like counter changes every few seconds, and what is left on shutdown
+def flush_like_counters():
+    with app.app_context():
+        like_counter_buffer_singleton.flush()
+
+if like_counter_buffer_singleton.enabled:
+    socketio.start_background_task(like_counter_buffer_singleton.run, app.app_context, socketio.sleep)
+    atexit.register(flush_like_counters)
+
+
+# Store sanitized HTML for posts and comments written before content_html existed
+@app.cli.command('backfill-content-html')
+def backfill_content_html():
+    filled = post_repository_singleton.backfill_content_html()
+    print(f'Sanitized {filled} posts and comments')
+
+# Build the home timelines of users that followed others before home timelines existed
+@app.cli.command('rebuild-home-timelines')
+def rebuild_home_timelines():
+    rebuilt = timeline_repository_singleton.rebuild_all()
+    print(f'Rebuilt {rebuilt} home timelines')
+
+
 if __name__ == '__main__':
     socketio.run(app)
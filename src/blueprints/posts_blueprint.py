@@ -1,7 +1,7 @@
-import bleach
 from flask import Blueprint, abort, jsonify, redirect, render_template, request, session, url_for, current_app
-from src.repositories.post_repository import post_repository_singleton
+from src.repositories.post_repository import MAX_SEARCH_PAGE, post_repository_singleton, walk_thread
 from src.repositories.user_repository import user_repository_singleton
+from src.sanitize import sanitize_html
 import sqlalchemy
 from src.models import db
 import os
@@ -19,19 +19,67 @@ router = Blueprint('posts_router', __name__, url_prefix='/posts')
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# counts and like state of the (post, creator) rows a page renders, as seen by viewer
+def post_stats(posts, viewer):
+    return post_repository_singleton.get_post_stats([post.post_id for post, _ in posts], viewer.user_id)
+
 @router.get('/')
 def posts():
     if not user_repository_singleton.is_logged_in():
         return redirect('/login')
-    all_posts = post_repository_singleton.get_all_posts_with_users()
     user = user_repository_singleton.get_user_by_username(
         user_repository_singleton.get_user_username())
     if not user:
         abort(401)
-    following_posts = post_repository_singleton.get_all_posts_of_followed_users(
-        user.user_id)
+    try:
+        all_posts, next_cursor = post_repository_singleton.get_posts_page(request.args.get('cursor'))
+    except ValueError:
+        abort(400)
 
-    return render_template('posts.html', list_posts_active=True, all_posts=all_posts, user=user, sanitize_html=sanitize_html)
+    return render_template('posts.html', list_posts_active=True, all_posts=all_posts, next_cursor=next_cursor, post_stats=post_stats(all_posts, user), user=user)
+
+# Next page of a feed for infinite scroll, e.g. /posts/feed?feed=following&cursor=...
+# returns {'html': rendered posts, 'next_cursor': cursor of the page after it or null}
+@router.get('/feed')
+def feed_page():
+    if not user_repository_singleton.is_logged_in():
+        abort(401)
+    user = user_repository_singleton.get_user_by_username(
+        user_repository_singleton.get_user_username())
+    if not user:
+        abort(401)
+    feed = request.args.get('feed', 'all')
+    cursor = request.args.get('cursor')
+    try:
+        if feed == 'all':
+            posts, next_cursor = post_repository_singleton.get_posts_page(cursor)
+        elif feed == 'following':
+            posts, next_cursor = post_repository_singleton.get_all_posts_of_followed_users(user.user_id, cursor)
+        else:
+            abort(400)
+    except ValueError:
+        abort(400)
+
+    html = render_template('posts_content.html', posts=posts, post_stats=post_stats(posts, user), user=user)
+    return jsonify({'html': html, 'next_cursor': next_cursor})
+
+# Full-text search over posts and comments, e.g. /posts/search?q=tesla+earnings&page=2
+# the query takes web search syntax: "quoted phrases", or, -excluded words
+@router.get('/search')
+def search():
+    if not user_repository_singleton.is_logged_in():
+        return redirect('/login')
+    user = user_repository_singleton.get_user_by_username(
+        user_repository_singleton.get_user_username())
+    if not user:
+        abort(401)
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    if page < 1 or page > MAX_SEARCH_PAGE:
+        abort(400)
+    results, has_next = post_repository_singleton.search(query, page) if query else ([], False)
+
+    return render_template('search.html', query=query, results=results, page=page, has_next=has_next and page < MAX_SEARCH_PAGE, user=user)
 
 @router.get('/edit/<int:post_id>')
 def edit_post(post_id):
@@ -112,34 +160,29 @@ def delete_post(post_id):
 # when a user likes a post
 @router.post('/like')
 def like_post():
-    post_id = request.form.get('post_id')
-    user_id = request.form.get('user_id')
-    if post_id == '' or post_id is None or user_id == '' or user_id is None:
+    # the ids arrive as form strings, anything that is not a whole number is None
+    post_id = request.form.get('post_id', type=int)
+    user_id = request.form.get('user_id', type=int)
+    if post_id is None or user_id is None:
         abort(400)
-    post_repository_singleton.add_like(post_id, user_id)
+    like = post_repository_singleton.add_like(post_id, user_id)
+    if like is None:
+        abort(404)
 
-    return jsonify({'status': 'success'})
+    return jsonify({'status': 'success', **like})
 
 # when a user likes a comment
 @router.post('/like_comment')
 def like_comment():
-    comment_id = request.form.get('comment_id')
-    user_id = request.form.get('user_id')
-    if comment_id == '' or comment_id is None or user_id == '' or user_id is None:
+    comment_id = request.form.get('comment_id', type=int)
+    user_id = request.form.get('user_id', type=int)
+    if comment_id is None or user_id is None:
         abort(400)
-    post_repository_singleton.add_like_to_comment(comment_id, user_id)
-
-    return jsonify({'status': 'success'})
-
-# Function to sanitize HTML content
-def sanitize_html(content):
-    allowed_tags = ['p', 'div', 'em', 'strong', 'del', 'a', 'img', 'h1', 'h2',
-                    'h3', 'h4', 'h5', 'h6', 'blockquote', 'ul', 'ol', 'li', 'hr', 'br', 'pre']
-    allowed_attributes = {'*': ['class', 'style'], 'a': ['href', 'target']}
+    like = post_repository_singleton.add_like_to_comment(comment_id, user_id)
+    if like is None:
+        abort(404)
 
-    sanitized_content = bleach.clean(
-        content, tags=allowed_tags, attributes=allowed_attributes)
-    return sanitized_content
+    return jsonify({'status': 'success', **like})
 
 # for comments and replies
 @router.post('/<int:post_id>/comment')
@@ -174,10 +217,13 @@ def following_posts():
         user_repository_singleton.get_user_username())
     if not user:
         abort(401)
-    following_posts = post_repository_singleton.get_all_posts_of_followed_users(
-        user.user_id)
+    try:
+        following_posts, next_cursor = post_repository_singleton.get_all_posts_of_followed_users(
+            user.user_id, request.args.get('cursor'))
+    except ValueError:
+        abort(400)
 
-    return render_template('posts.html', following_posts_active=True, following_posts=following_posts, user=user, sanitize_html=sanitize_html)
+    return render_template('posts.html', following_posts_active=True, following_posts=following_posts, next_cursor=next_cursor, post_stats=post_stats(following_posts, user), user=user)
 
 # Create a get request for single post page.
 @router.get('/<int:post_id>')
@@ -190,8 +236,16 @@ def post(post_id):
     if not post or not user:
         abort(400)
 
+    try:
+        comments, comments_cursor = post_repository_singleton.get_comment_thread(post_id, request.args.get('comments'))
+    except ValueError:
+        abort(400)
+    stats = post_repository_singleton.get_post_stats([post_id], user.user_id)[post_id]
+    _, liked_comment_ids = post_repository_singleton.get_liked_ids(
+        user.user_id, comment_ids=[comment.comment_id for comment in walk_thread(comments)])
+
     following = False
 
     if user.is_following(post.creator):
         following = True
-    return render_template('single_post.html', post=post, user=user, sanitize_html=sanitize_html, following=following)
\ No newline at end of file
+    return render_template('single_post.html', post=post, stats=stats, comments=comments, comments_cursor=comments_cursor, liked_comment_ids=liked_comment_ids, user=user, following=following)
\ No newline at end of file
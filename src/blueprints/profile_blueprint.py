@@ -8,7 +8,7 @@ from src.repositories.user_repository import user_repository_singleton
 from src.repositories.post_repository import post_repository_singleton
 from werkzeug.utils import secure_filename
 from PIL import Image
-from src.blueprints.posts_blueprint import sanitize_html
+from src.blueprints.posts_blueprint import post_stats
 
 router = Blueprint('profile_router', __name__, url_prefix='/profile')
 
@@ -53,7 +53,7 @@ def profile(username: str):
 
     profile_picture = url_for(
         'static', filename='profile_pics/' + user.profile_picture)
-    return render_template('profile.html', user=user, profile_picture=profile_picture, posts=posts, followers = user.get_all_followers(), following = user.get_all_following(), sanitize_html=sanitize_html, is_following=is_following)
+    return render_template('profile.html', user=user, profile_picture=profile_picture, posts=posts, post_stats=post_stats(posts, logged_in_user), viewer=logged_in_user, followers = user.get_all_followers(), following = user.get_all_following(), is_following=is_following)
 
 
 
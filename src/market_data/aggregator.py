@@ -0,0 +1,123 @@
+from datetime import datetime, time as dt_time
+from threading import Lock
+from zoneinfo import ZoneInfo
+
+# Sessions roll over at midnight exchange time
+EXCHANGE_TZ = ZoneInfo('America/New_York')
+
+# Intraday timeframes are fixed-size buckets aligned to the epoch (and so to clock minutes and hours),
+# '1d' is one bucket per exchange trading date
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+}
+DEFAULT_TIMEFRAMES = ('1m', '1h', '1d')
+
+
+# start (epoch seconds) of the exchange trading date ts falls in
+def session_start(ts):
+    day = datetime.fromtimestamp(ts, EXCHANGE_TZ).date()
+    return int(datetime.combine(day, dt_time(0), EXCHANGE_TZ).timestamp())
+
+def bucket_start(timeframe, ts):
+    if timeframe == '1d':
+        return session_start(ts)
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    return ts - ts % seconds
+
+
+class LiveBar:
+    # minute/minute_volume remember the last 1m bar folded in, so a revised
+    # version of that bar replaces its volume instead of adding it twice
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume', 'minute', 'minute_volume')
+
+    def __init__(self, start, open, high, low, close, volume, minute=None):
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.minute = minute
+        self.minute_volume = volume
+
+    def as_dict(self):
+        return {
+            't': self.start,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+        }
+
+    def __repr__(self) -> str:
+        return f'LiveBar({self.start}, {self.open}, {self.high}, {self.low}, {self.close}, {self.volume})'
+
+
+# Rolling OHLCV state per (symbol, timeframe), fed with raw quotes or 1m bars.
+# Each update touches one slotted LiveBar per timeframe, so updates and reads are O(1).
+class BarAggregator:
+
+    def __init__(self, timeframes=DEFAULT_TIMEFRAMES):
+        for timeframe in timeframes:
+            if timeframe != '1d' and timeframe not in TIMEFRAME_SECONDS:
+                raise ValueError(f'Unknown timeframe: {timeframe}')
+        self.timeframes = tuple(timeframes)
+        self._lock = Lock()
+        self._bars = {}
+
+    # fold a trade/quote price into every timeframe
+    def add_quote(self, symbol, ts, price, volume=0.0):
+        ts = int(ts)
+        with self._lock:
+            for timeframe in self.timeframes:
+                start = bucket_start(timeframe, ts)
+                bar = self._bars.get((symbol, timeframe))
+                if bar is None or start > bar.start:
+                    self._bars[(symbol, timeframe)] = LiveBar(start, price, price, price, price, volume)
+                elif start == bar.start:
+                    bar.high = max(bar.high, price)
+                    bar.low = min(bar.low, price)
+                    bar.close = price
+                    bar.volume += volume
+                # quotes older than the live bar are late and ignored
+
+    # fold a 1m bar into every timeframe, the same minute may be sent again while it is still forming
+    def add_bar(self, symbol, ts, open, high, low, close, volume):
+        ts = int(ts)
+        with self._lock:
+            for timeframe in self.timeframes:
+                start = bucket_start(timeframe, ts)
+                bar = self._bars.get((symbol, timeframe))
+                if bar is None or start > bar.start:
+                    self._bars[(symbol, timeframe)] = LiveBar(start, open, high, low, close, volume, ts)
+                elif start == bar.start and (bar.minute is None or ts >= bar.minute):
+                    if ts == bar.minute:
+                        bar.volume += volume - bar.minute_volume
+                    else:
+                        bar.volume += volume
+                        bar.minute = ts
+                    bar.minute_volume = volume
+                    bar.high = max(bar.high, high)
+                    bar.low = min(bar.low, low)
+                    bar.close = close
+
+    # live bar of a symbol for a timeframe as a dict (t, open, high, low, close, volume),
+    # None before the first update
+    def current(self, symbol, timeframe):
+        with self._lock:
+            bar = self._bars.get((symbol, timeframe))
+            return bar.as_dict() if bar is not None else None
+
+    # drop every timeframe of a symbol
+    def reset(self, symbol):
+        with self._lock:
+            for timeframe in self.timeframes:
+                self._bars.pop((symbol, timeframe), None)
+
+# Singleton to be used in other modules
+bar_aggregator_singleton = BarAggregator()
@@ -0,0 +1,309 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from src.market_data.executor import market_data_executor_singleton
+from src.market_data.providers import market_data_provider_singleton
+from src.market_data.scheduler import CLOSED, market_calendar_singleton
+from src.market_data.subscriptions import SYMBOL_PATTERN
+
+# One fixed-size record per 1m bar, the same layout is used in memory and on disk
+BAR_DTYPE = np.dtype([
+    ('t', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+BAR_STORE_FOLDER = os.getenv('BAR_STORE_FOLDER', 'data/bars/')
+
+# yfinance only serves 1m bars for the last 7 days
+RETENTION_SECONDS = 7 * 24 * 60 * 60
+# how many expired bars may pile up before the file is rewritten without them
+COMPACT_AFTER = 2000
+# history pulled for a symbol the store has never seen
+INITIAL_PERIOD = '5d'
+# minimum time between two upstream delta fetches for one symbol
+MIN_REFRESH_SECONDS = 5
+# same while the exchange is closed and no new bars can show up
+CLOSED_REFRESH_SECONDS = 15 * 60
+# symbols kept in memory, the least recently used ones beyond that are read back from their file when needed
+MAX_SYMBOLS = 256
+
+
+def fetch_bars_since(symbol, start):
+    return market_data_provider_singleton.history(symbol, interval='1m', start=start)
+
+def fetch_initial_bars(symbol):
+    return market_data_provider_singleton.history(symbol, period=INITIAL_PERIOD, interval='1m')
+
+# turn a yfinance history frame into bar records
+def history_to_records(df):
+    if df is None or df.empty:
+        return np.empty(0, dtype=BAR_DTYPE)
+    columns = {column.lower(): column for column in df.columns}
+    records = np.empty(len(df), dtype=BAR_DTYPE)
+    records['t'] = df.index.asi8 // 1_000_000_000
+    for field in BAR_FIELDS:
+        records[field] = df[columns[field]].to_numpy(dtype='f8', na_value=np.nan)
+    # bars yfinance could not fill are all NaN, drop them
+    return records[~np.isnan(records['close'])]
+
+
+class _SymbolBars:
+    # refresh_lock serializes upstream fetches, lock guards the bars,
+    # so readers are never held up by a slow fetch; pins counts refreshes under way (guarded by the store lock)
+    __slots__ = ('refresh_lock', 'lock', 'bars', 'size', 'last_refresh', 'expired', 'pins')
+
+    def __init__(self, bars):
+        self.refresh_lock = Lock()
+        self.lock = Lock()
+        self.bars = bars
+        self.size = len(bars)
+        self.last_refresh = 0.0
+        self.expired = 0
+        self.pins = 0
+
+    def view(self):
+        return self.bars[:self.size]
+
+    def last_t(self):
+        return int(self.bars['t'][self.size - 1]) if self.size else None
+
+    # append records, growing the buffer geometrically so appends stay amortized O(1)
+    def extend(self, records):
+        needed = self.size + len(records)
+        if needed > len(self.bars):
+            grown = np.empty(max(needed, 2 * len(self.bars), 512), dtype=BAR_DTYPE)
+            grown[:self.size] = self.view()
+            self.bars = grown
+        self.bars[self.size:needed] = records
+        self.size = needed
+
+
+# Per-symbol store of 1m OHLCV bars.
+# Bars are kept as a compact structured numpy array and mirrored to an append-only file,
+# a refresh only asks upstream for the bars at or after the last stored timestamp
+# (the last bar is usually still forming, so it is overwritten in place).
+# At most max_symbols symbols stay in memory, least recently used first out.
+class BarStore:
+
+    def __init__(self, folder=BAR_STORE_FOLDER, fetch_since=fetch_bars_since, fetch_initial=fetch_initial_bars,
+                 min_refresh_seconds=MIN_REFRESH_SECONDS, clock=time.monotonic, wall_clock=time.time, calendar=None,
+                 executor=market_data_executor_singleton, max_symbols=MAX_SYMBOLS):
+        self._folder = folder
+        self._fetch_since = fetch_since
+        self._fetch_initial = fetch_initial
+        self._min_refresh_seconds = min_refresh_seconds
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._calendar = calendar
+        self._executor = executor
+        self._max_symbols = max_symbols
+        self._lock = Lock()
+        self._symbols = OrderedDict()
+
+    # every symbol gets an entry and a file, so anything that is not a ticker raises ValueError
+    @staticmethod
+    def normalize(symbol):
+        normalized = symbol.strip().upper() if isinstance(symbol, str) else ''
+        if not SYMBOL_PATTERN.fullmatch(normalized):
+            raise ValueError(f'Not a ticker symbol: {symbol!r}')
+        return normalized
+
+    # bring a symbol up to date with the upstream, at most once per min_refresh_seconds,
+    # returns False when the upstream call failed.
+    # With a timeout the fetch runs on the market data pool and MarketDataTimeout / MarketDataBusy
+    # are raised when it is late or the pool is full, the stored bars stay readable meanwhile.
+    def refresh(self, symbol, timeout=None):
+        symbol = self.normalize(symbol)
+        # pinned from the lookup on, so the symbol cannot be evicted before the refresh takes its lock
+        bars = self._get(symbol, pin=True)
+        if timeout is None:
+            try:
+                return self._refresh(symbol, bars)
+            finally:
+                self._unpin(bars)
+        try:
+            future = self._executor.submit(self._refresh, symbol, bars)
+        except Exception:
+            self._unpin(bars)
+            raise
+        # done callbacks also run for a call cancelled before it started
+        future.add_done_callback(lambda _: self._unpin(bars))
+        return self._executor.wait(future, timeout)
+
+    def _refresh(self, symbol, bars):
+        with bars.refresh_lock:
+            now = self._clock()
+            if now - bars.last_refresh < self._refresh_interval(bars):
+                return True
+            bars.last_refresh = now
+            with bars.lock:
+                last_t = bars.last_t()
+            initial = last_t is None or self._wall_clock() - last_t > RETENTION_SECONDS
+            try:
+                df = self._fetch_initial(symbol) if initial else self._fetch_since(symbol, last_t)
+            except Exception as e:
+                # keep serving what is stored, the next refresh will try again
+                print(f'Bar refresh failed for {symbol}: {e}')
+                return False
+            records = history_to_records(df)
+            with bars.lock:
+                if initial and len(records):
+                    self._reset(symbol, bars)
+                self._merge(symbol, bars, records)
+            return True
+
+    # 1m bars of a symbol as a numpy record array, refreshed first unless refresh=False
+    def get_bars(self, symbol, refresh=True):
+        symbol = self.normalize(symbol)
+        if refresh:
+            self.refresh(symbol)
+        bars = self._get(symbol)
+        with bars.lock:
+            return bars.view().copy()
+
+    # 1m bars in the shape the chart expects (date, open, high, low, close, volume)
+    def get_frame(self, symbol, refresh=True):
+        return bars_to_frame(self.get_bars(symbol, refresh))
+
+    # last n bars without touching the upstream
+    def tail(self, symbol, n):
+        bars = self._get(self.normalize(symbol))
+        with bars.lock:
+            return bars.view()[-n:].copy()
+
+    # bars at or after ts without touching the upstream
+    def since(self, symbol, ts):
+        bars = self._get(self.normalize(symbol))
+        with bars.lock:
+            view = bars.view()
+            return view[np.searchsorted(view['t'], ts):].copy()
+
+    def _refresh_interval(self, bars):
+        # the first fetch of a symbol always goes through, even over a weekend
+        if bars.size and bars.last_refresh and self._calendar is not None and self._calendar.phase() == CLOSED:
+            return max(self._min_refresh_seconds, CLOSED_REFRESH_SECONDS)
+        return self._min_refresh_seconds
+
+    def _get(self, symbol, pin=False):
+        with self._lock:
+            bars = self._symbols.get(symbol)
+            if bars is not None:
+                self._symbols.move_to_end(symbol)
+            else:
+                bars = self._symbols[symbol] = _SymbolBars(self._load(symbol))
+                self._evict()
+            if pin:
+                bars.pins += 1
+            return bars
+
+    def _unpin(self, bars):
+        with self._lock:
+            bars.pins -= 1
+
+    # drop the least recently used symbols over max_symbols, their bars are all on disk.
+    # A pinned symbol stays, a second copy loaded from its file would append to it twice.
+    def _evict(self):
+        excess = len(self._symbols) - self._max_symbols
+        # never the symbol just added, it is the one being asked for
+        for symbol in list(self._symbols)[:-1]:
+            if excess <= 0:
+                break
+            if not self._symbols[symbol].pins:
+                del self._symbols[symbol]
+                excess -= 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._symbols)
+
+    def _merge(self, symbol, bars, records):
+        if not len(records):
+            return
+        last_t = bars.last_t()
+        if last_t is not None:
+            records = records[records['t'] >= last_t]
+            if len(records) and records['t'][0] == last_t:
+                # the last stored bar was still forming, overwrite it
+                bars.bars[bars.size - 1] = records[0]
+                self._rewrite_last(symbol, records[0])
+                records = records[1:]
+        if not len(records):
+            return
+        bars.extend(records)
+        self._append(symbol, records)
+
+        cutoff = self._wall_clock() - RETENTION_SECONDS
+        bars.expired = int(np.searchsorted(bars.view()['t'], cutoff))
+        if bars.expired >= COMPACT_AFTER:
+            self._compact(symbol, bars)
+
+    def _reset(self, symbol, bars):
+        bars.bars = np.empty(0, dtype=BAR_DTYPE)
+        bars.size = 0
+        bars.expired = 0
+        path = self._path(symbol)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _compact(self, symbol, bars):
+        kept = bars.view()[bars.expired:].copy()
+        bars.bars = kept
+        bars.size = len(kept)
+        bars.expired = 0
+        path = self._path(symbol)
+        kept.tofile(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def _path(self, symbol):
+        return os.path.join(self._folder, re.sub(r'[^A-Z0-9.^=-]', '_', symbol) + '.bars')
+
+    def _load(self, symbol):
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        size = os.path.getsize(path) // BAR_DTYPE.itemsize
+        if os.path.getsize(path) != size * BAR_DTYPE.itemsize:
+            # drop a torn write at the end of the file so later appends stay aligned
+            os.truncate(path, size * BAR_DTYPE.itemsize)
+        return np.fromfile(path, dtype=BAR_DTYPE, count=size)
+
+    def _append(self, symbol, records):
+        os.makedirs(self._folder, exist_ok=True)
+        with open(self._path(symbol), 'ab') as file:
+            file.write(records.tobytes())
+
+    def _rewrite_last(self, symbol, record):
+        path = self._path(symbol)
+        if not os.path.exists(path) or os.path.getsize(path) < BAR_DTYPE.itemsize:
+            return
+        with open(path, 'r+b') as file:
+            file.seek(-BAR_DTYPE.itemsize, os.SEEK_END)
+            file.write(record.tobytes())
+
+
+# inverse of bars_to_frame
+def frame_to_records(df):
+    records = np.empty(len(df), dtype=BAR_DTYPE)
+    records['t'] = df['date'].to_numpy(dtype='datetime64[s]').astype('i8')
+    for field in BAR_FIELDS:
+        records[field] = df[field].to_numpy(dtype='f8')
+    return records
+
+def bars_to_frame(bars):
+    df = pd.DataFrame({field: bars[field] for field in BAR_FIELDS})
+    df.insert(0, 'date', pd.to_datetime(bars['t'], unit='s', utc=True))
+    return df
+
+# Singleton to be used in other modules
+bar_store_singleton = BarStore(calendar=market_calendar_singleton)
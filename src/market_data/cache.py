@@ -0,0 +1,270 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from src.market_data.executor import FETCH_TIMEOUT, CooperativeEvent, MarketDataBusy, MarketDataTimeout, market_data_executor_singleton
+from src.market_data.providers import market_data_provider_singleton
+from src.market_data.scheduler import CLOSED, market_calendar_singleton
+
+# How long (seconds) a history series stays fresh, by bar interval.
+# Short intervals change every minute, daily and longer bars barely move.
+INTERVAL_TTLS = {
+    '1m': 5,
+    '2m': 10,
+    '5m': 30,
+    '15m': 60,
+    '30m': 120,
+    '60m': 300,
+    '90m': 300,
+    '1h': 300,
+    '1d': 900,
+    '5d': 1800,
+    '1wk': 3600,
+    '1mo': 3600,
+    '3mo': 3600,
+}
+DEFAULT_TTL = 60
+# Bars of these intervals cannot change while the exchange is closed, so they live longer then
+CLOSED_TTL = 900
+
+# How long (seconds) an expired entry may still be served while it is refreshed in the background
+STALE_TTL = 300
+
+MAX_ENTRIES = 512
+
+
+def fetch_history(symbol, period, interval):
+    return market_data_provider_singleton.history(symbol, period=period, interval=interval)
+
+# one batched download for many symbols, returns {symbol: DataFrame}
+def fetch_history_batch(symbols, period, interval):
+    return market_data_provider_singleton.batch_history(symbols, period, interval)
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'stale_until')
+
+    def __init__(self, value, expires_at, stale_until):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = CooperativeEvent()
+        self.value = None
+        self.error = None
+
+
+# TTL + LRU cache in front of the market data API.
+# Concurrent misses for one key share a single upstream fetch (single-flight),
+# expired entries are served while a background refresh runs (stale-while-revalidate),
+# and the last good value is kept when the upstream call fails or comes back empty.
+# Fetches run on the bounded market data pool; a caller waits at most `timeout` seconds
+# and then gets the stale value if there is one, MarketDataTimeout otherwise, without blocking other greenlets.
+# Cached DataFrames are shared between callers and must not be modified in place.
+class MarketDataCache:
+
+    def __init__(self, fetcher=fetch_history, batch_fetcher=fetch_history_batch, max_entries=MAX_ENTRIES, stale_ttl=STALE_TTL, clock=time.monotonic,
+                 calendar=None, executor=market_data_executor_singleton, timeout=None):
+        self._fetcher = fetcher
+        self._batch_fetcher = batch_fetcher
+        self._max_entries = max_entries
+        self._stale_ttl = stale_ttl
+        self._clock = clock
+        self._calendar = calendar
+        self._executor = executor
+        self._timeout = timeout
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+
+    @staticmethod
+    def make_key(symbol, period, interval):
+        return (symbol.strip().upper(), period, interval)
+
+    def ttl_for(self, key):
+        ttl = INTERVAL_TTLS.get(key[2], DEFAULT_TTL)
+        if self._calendar is not None and ttl < CLOSED_TTL and self._calendar.phase() == CLOSED:
+            return CLOSED_TTL
+        return ttl
+
+    # get a history DataFrame for (symbol, period, interval)
+    def get_history(self, symbol, period, interval):
+        key = self.make_key(symbol, period, interval)
+        return self.get(key, lambda: self._fetcher(*key))
+
+    def get(self, key, loader):
+        now = self._clock()
+        stale = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now < entry.expires_at:
+                    return entry.value
+                if now < entry.stale_until:
+                    stale = entry
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if leader:
+            self._submit({key: flight}, self._run_flight, key, loader, flight)
+        if stale is not None:
+            # stale-while-revalidate, the refresh runs in the background
+            return stale.value
+        if not flight.event.wait(self._timeout):
+            if entry is not None:
+                return entry.value
+            raise MarketDataTimeout(f'No market data for {key} within {self._timeout}s')
+
+        if flight.error is not None:
+            # stale-if-error: an old value beats no chart at all
+            if entry is not None:
+                return entry.value
+            raise flight.error
+        return flight.value
+
+    # get history DataFrames for many symbols with the same (period, interval)
+    # every symbol that misses the cache is fetched in one batched upstream call
+    # returns {symbol: DataFrame}, symbols the upstream knows nothing about are left out
+    def get_history_many(self, symbols, period, interval):
+        keys = [self.make_key(symbol, period, interval) for symbol in symbols]
+        values = self.get_many(keys, lambda missing: self._batch_load(missing, period, interval))
+        return {key[0]: value for key, value in values.items()}
+
+    # batch version of get(), batch_loader takes a list of keys and returns {key: value}
+    def get_many(self, keys, batch_loader):
+        now = self._clock()
+        results = {}
+        # key -> (flight, entry) for flights started here, and flights started by someone else
+        owned = {}
+        waiting = {}
+        refresh = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    if now < entry.expires_at:
+                        results[key] = entry.value
+                        continue
+                    if now < entry.stale_until:
+                        results[key] = entry.value
+                        if key not in self._flights:
+                            refresh[key] = self._flights[key] = _Flight()
+                        continue
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    owned[key] = (flight, entry)
+                else:
+                    waiting[key] = (flight, entry)
+
+        if refresh:
+            self._submit(refresh, self._run_batch, refresh, batch_loader)
+        if owned:
+            flights = {key: flight for key, (flight, _) in owned.items()}
+            self._submit(flights, self._run_batch, flights, batch_loader)
+
+        # symbols still loading at the deadline fall back to their stale value or are left out
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        for key, (flight, entry) in {**owned, **waiting}.items():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not flight.event.wait(remaining):
+                if entry is not None:
+                    results[key] = entry.value
+            elif flight.error is None:
+                results[key] = flight.value
+            elif entry is not None:
+                results[key] = entry.value
+        return results
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def put(self, key, value):
+        now = self._clock()
+        ttl = self.ttl_for(key)
+        with self._lock:
+            self._entries[key] = _Entry(value, now + ttl, now + ttl + self._stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _batch_load(self, keys, period, interval):
+        frames = self._batch_fetcher([key[0] for key in keys], period, interval)
+        return {key: frames[key[0]] for key in keys if key[0] in frames}
+
+    # start flights on the worker pool, when the pool is full they fail right away
+    def _submit(self, flights, run, *args):
+        try:
+            self._executor.submit(run, *args)
+        except MarketDataBusy as e:
+            with self._lock:
+                for key in flights:
+                    self._flights.pop(key, None)
+            for flight in flights.values():
+                flight.error = e
+                flight.event.set()
+
+    def _run_batch(self, flights, batch_loader):
+        try:
+            values = batch_loader(list(flights))
+            for key, flight in flights.items():
+                if key not in values:
+                    flight.error = KeyError(key)
+                    continue
+                value = values[key]
+                previous = self.peek(key)
+                if getattr(value, 'empty', False) and previous is not None:
+                    value = previous
+                self.put(key, value)
+                flight.value = value
+        except Exception as e:
+            for flight in flights.values():
+                flight.error = e
+        finally:
+            with self._lock:
+                for key in flights:
+                    self._flights.pop(key, None)
+            for flight in flights.values():
+                flight.event.set()
+
+    def _run_flight(self, key, loader, flight):
+        try:
+            value = loader()
+            previous = self.peek(key)
+            # yfinance reports rate limits and outages as an empty frame, keep the last good one
+            if getattr(value, 'empty', False) and previous is not None:
+                value = previous
+            self.put(key, value)
+            flight.value = value
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+# Singleton to be used in other modules
+market_data_cache_singleton = MarketDataCache(calendar=market_calendar_singleton, timeout=FETCH_TIMEOUT)
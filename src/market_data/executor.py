@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from gevent import Timeout, get_hub
+from gevent.hub import Waiter
+
+# Threads doing blocking market data I/O, and how many more calls may queue behind them
+MAX_WORKERS = int(os.getenv('MARKET_DATA_WORKERS', '8'))
+MAX_PENDING = 32
+# Seconds a request handler waits for one upstream fetch
+FETCH_TIMEOUT = float(os.getenv('MARKET_DATA_TIMEOUT', '8'))
+
+
+class MarketDataUnavailable(Exception):
+    pass
+
+# the upstream did not answer before the deadline
+class MarketDataTimeout(MarketDataUnavailable):
+    pass
+
+# every worker is busy and the queue is full
+class MarketDataBusy(MarketDataUnavailable):
+    pass
+
+
+# One-shot event set from the pool threads and waited on by request greenlets.
+# The server runs on gevent without monkey-patching, so threading.Event.wait() or future.result()
+# would block the whole hub and stall every other client with it. Each waiter here parks only its
+# greenlet on an async watcher of its own hub, which set() wakes from any thread.
+class CooperativeEvent:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._flag = False
+        self._watchers = []
+
+    def is_set(self):
+        return self._flag
+
+    def set(self):
+        with self._lock:
+            self._flag = True
+            for watcher in self._watchers:
+                watcher.send()
+            self._watchers = []
+
+    # True once set, False when timeout (seconds, None waits for ever) ran out first
+    def wait(self, timeout=None):
+        if self._flag:
+            return True
+        hub = get_hub()
+        waiter = Waiter(hub)
+        watcher = hub.loop.async_()
+        watcher.start(waiter.switch, None)
+        with self._lock:
+            if self._flag:
+                watcher.close()
+                return True
+            self._watchers.append(watcher)
+        try:
+            with Timeout(timeout, False):
+                waiter.get()
+            return self._flag
+        finally:
+            with self._lock:
+                if watcher in self._watchers:
+                    self._watchers.remove(watcher)
+                watcher.close()
+
+
+# Bounded thread pool for blocking market data calls.
+# A caller only waits up to its deadline; a call still queued then is cancelled, one already
+# running finishes in the background (its result still lands in the cache for the next request).
+class MarketDataExecutor:
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='market-data')
+        self._slots = BoundedSemaphore(max_workers + max_pending)
+
+    # queue fn(*args), raises MarketDataBusy instead of queueing without bound
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise MarketDataBusy('Market data workers are busy')
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    # run fn(*args) on the pool and wait at most timeout seconds (None waits for ever)
+    def run(self, fn, *args, timeout=None):
+        return self.wait(self.submit(fn, *args), timeout)
+
+    # wait at most timeout seconds for a submitted call, a call still queued then is cancelled
+    def wait(self, future, timeout=None):
+        done = CooperativeEvent()
+        future.add_done_callback(lambda _: done.set())
+        if not done.wait(timeout):
+            future.cancel()
+            raise MarketDataTimeout(f'Market data call timed out after {timeout}s')
+        return future.result()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+# Singleton to be used in other modules
+market_data_executor_singleton = MarketDataExecutor()
@@ -0,0 +1,434 @@
+import math
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from src.market_data.aggregator import EXCHANGE_TZ, session_start
+
+NAN = float('nan')
+
+
+# Every indicator works on bar record arrays (t, open, high, low, close, volume).
+# seed() computes the whole series vectorized and leaves the indicator in the state
+# after the last bar; update() folds in one new bar and revise() replaces the last bar
+# (it is usually still forming), both in O(1).
+class Indicator(ABC):
+    outputs = ('value',)
+    # how each positional study parameter is parsed, periods are whole bars
+    param_types = (int,)
+
+    @abstractmethod
+    def seed(self, bars):
+        pass
+
+    @abstractmethod
+    def update(self, bar):
+        pass
+
+    def revise(self, bar):
+        self._rollback()
+        return self.update(bar)
+
+    # undo the last update(), so revise() can fold the bar in again
+    @abstractmethod
+    def _rollback(self):
+        pass
+
+    # the vectorized series ends with the state before the last bar, the last bar is folded
+    # in with update() so the indicator can revise it later
+    def _finish_seed(self, bars, values):
+        if len(bars):
+            self.update(bars[-1])
+        return values
+
+
+def _ema_series(values, span):
+    return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+def _mask_head(values, count):
+    values = np.array(values, dtype='f8')
+    values[:count] = NAN
+    return values
+
+
+class SMA(Indicator):
+    name = 'sma'
+
+    def __init__(self, period=20):
+        self.period = int(period)
+        self._window = deque()
+        self._sum = 0.0
+        self._undo = None
+
+    def seed(self, bars):
+        close = bars['close'].astype('f8')
+        values = {'value': pd.Series(close).rolling(self.period).mean().to_numpy()}
+        head = close[max(0, len(close) - 1 - self.period):len(close) - 1]
+        self._window = deque(head.tolist())
+        self._sum = float(head.sum())
+        return self._finish_seed(bars, values)
+
+    def update(self, bar):
+        x = float(bar['close'])
+        popped = None
+        self._window.append(x)
+        self._sum += x
+        if len(self._window) > self.period:
+            popped = self._window.popleft()
+            self._sum -= popped
+        self._undo = (x, popped)
+        return {'value': self._sum / self.period if len(self._window) == self.period else NAN}
+
+    def _rollback(self):
+        x, popped = self._undo
+        self._window.pop()
+        self._sum -= x
+        if popped is not None:
+            self._window.appendleft(popped)
+            self._sum += popped
+
+
+class EMA(Indicator):
+    name = 'ema'
+
+    def __init__(self, period=20):
+        self.period = int(period)
+        self._alpha = 2.0 / (self.period + 1)
+        self._ema = None
+        self._count = 0
+        self._undo = None
+
+    def seed(self, bars):
+        close = bars['close'].astype('f8')
+        ema = _ema_series(close, self.period)
+        values = {'value': _mask_head(ema, self.period - 1)}
+        self._count = max(len(close) - 1, 0)
+        self._ema = float(ema[-2]) if len(close) > 1 else None
+        return self._finish_seed(bars, values)
+
+    def update(self, bar):
+        x = float(bar['close'])
+        self._undo = (self._ema, self._count)
+        self._ema = x if self._ema is None else self._ema + self._alpha * (x - self._ema)
+        self._count += 1
+        return {'value': self._ema if self._count >= self.period else NAN}
+
+    def _rollback(self):
+        self._ema, self._count = self._undo
+
+
+# Wilder's RSI, gains and losses smoothed with alpha = 1 / period
+class RSI(Indicator):
+    name = 'rsi'
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self._alpha = 1.0 / self.period
+        self._prev_close = None
+        self._avg_gain = None
+        self._avg_loss = None
+        self._count = 0
+        self._undo = None
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def seed(self, bars):
+        close = bars['close'].astype('f8')
+        diff = np.diff(close)
+        avg_gain = pd.Series(np.clip(diff, 0, None)).ewm(alpha=self._alpha, adjust=False).mean().to_numpy()
+        avg_loss = pd.Series(np.clip(-diff, 0, None)).ewm(alpha=self._alpha, adjust=False).mean().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+        values = {'value': _mask_head(np.concatenate(([NAN], rsi)), self.period)}
+
+        self._count = max(len(close) - 1, 0)
+        self._prev_close = float(close[-2]) if len(close) > 1 else None
+        self._avg_gain = float(avg_gain[-2]) if len(diff) > 1 else None
+        self._avg_loss = float(avg_loss[-2]) if len(diff) > 1 else None
+        return self._finish_seed(bars, values)
+
+    def update(self, bar):
+        x = float(bar['close'])
+        self._undo = (self._prev_close, self._avg_gain, self._avg_loss, self._count)
+        value = NAN
+        if self._prev_close is not None:
+            change = x - self._prev_close
+            gain = max(change, 0.0)
+            loss = max(-change, 0.0)
+            if self._avg_gain is None:
+                self._avg_gain, self._avg_loss = gain, loss
+            else:
+                self._avg_gain += self._alpha * (gain - self._avg_gain)
+                self._avg_loss += self._alpha * (loss - self._avg_loss)
+            if self._count >= self.period:
+                value = self._rsi(self._avg_gain, self._avg_loss)
+        self._prev_close = x
+        self._count += 1
+        return {'value': value}
+
+    def _rollback(self):
+        self._prev_close, self._avg_gain, self._avg_loss, self._count = self._undo
+
+
+class MACD(Indicator):
+    name = 'macd'
+    outputs = ('macd', 'signal', 'histogram')
+    param_types = (int, int, int)
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = int(fast)
+        self.slow = int(slow)
+        self.signal = int(signal)
+        self._alphas = (2.0 / (self.fast + 1), 2.0 / (self.slow + 1), 2.0 / (self.signal + 1))
+        # fast ema, slow ema, signal ema of the (unmasked) macd line
+        self._emas = None
+        self._count = 0
+        self._undo = None
+
+    def seed(self, bars):
+        close = bars['close'].astype('f8')
+        fast = _ema_series(close, self.fast)
+        slow = _ema_series(close, self.slow)
+        macd = fast - slow
+        signal = _ema_series(macd, self.signal)
+        values = {
+            'macd': _mask_head(macd, self.slow - 1),
+            'signal': _mask_head(signal, self.slow + self.signal - 2),
+            'histogram': _mask_head(macd - signal, self.slow + self.signal - 2),
+        }
+        self._count = max(len(close) - 1, 0)
+        self._emas = (float(fast[-2]), float(slow[-2]), float(signal[-2])) if len(close) > 1 else None
+        return self._finish_seed(bars, values)
+
+    def update(self, bar):
+        x = float(bar['close'])
+        self._undo = (self._emas, self._count)
+        if self._emas is None:
+            fast = slow = x
+            signal = 0.0
+        else:
+            fast, slow, signal = self._emas
+            fast += self._alphas[0] * (x - fast)
+            slow += self._alphas[1] * (x - slow)
+            signal += self._alphas[2] * ((fast - slow) - signal)
+        self._emas = (fast, slow, signal)
+        self._count += 1
+        macd = fast - slow
+        signal_ready = self._count >= self.slow + self.signal - 1
+        return {
+            'macd': macd if self._count >= self.slow else NAN,
+            'signal': signal if signal_ready else NAN,
+            'histogram': macd - signal if signal_ready else NAN,
+        }
+
+    def _rollback(self):
+        self._emas, self._count = self._undo
+
+
+# Bollinger Bands around an SMA, with the population standard deviation
+class BollingerBands(Indicator):
+    name = 'bbands'
+    outputs = ('middle', 'upper', 'lower')
+    param_types = (int, float)
+
+    def __init__(self, period=20, width=2.0):
+        self.period = int(period)
+        self.width = float(width)
+        self._window = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._undo = None
+
+    def seed(self, bars):
+        close = pd.Series(bars['close'].astype('f8'))
+        middle = close.rolling(self.period).mean().to_numpy()
+        std = close.rolling(self.period).std(ddof=0).to_numpy()
+        values = {'middle': middle, 'upper': middle + self.width * std, 'lower': middle - self.width * std}
+        head = close.to_numpy()[max(0, len(close) - 1 - self.period):len(close) - 1]
+        self._window = deque(head.tolist())
+        self._sum = float(head.sum())
+        self._sum_sq = float((head * head).sum())
+        return self._finish_seed(bars, values)
+
+    def update(self, bar):
+        x = float(bar['close'])
+        popped = None
+        self._window.append(x)
+        self._sum += x
+        self._sum_sq += x * x
+        if len(self._window) > self.period:
+            popped = self._window.popleft()
+            self._sum -= popped
+            self._sum_sq -= popped * popped
+        self._undo = (x, popped)
+        if len(self._window) < self.period:
+            return {'middle': NAN, 'upper': NAN, 'lower': NAN}
+        middle = self._sum / self.period
+        std = math.sqrt(max(self._sum_sq / self.period - middle * middle, 0.0))
+        return {'middle': middle, 'upper': middle + self.width * std, 'lower': middle - self.width * std}
+
+    def _rollback(self):
+        x, popped = self._undo
+        self._window.pop()
+        self._sum -= x
+        self._sum_sq -= x * x
+        if popped is not None:
+            self._window.appendleft(popped)
+            self._sum += popped
+            self._sum_sq += popped * popped
+
+
+# Volume weighted average price, anchored at the start of each exchange session
+class VWAP(Indicator):
+    name = 'vwap'
+    param_types = ()
+
+    def __init__(self):
+        self._session = None
+        self._pv = 0.0
+        self._volume = 0.0
+        self._undo = None
+
+    def seed(self, bars):
+        sessions = pd.to_datetime(bars['t'], unit='s', utc=True).tz_convert(EXCHANGE_TZ).normalize().asi8 // 1_000_000_000
+        typical = (bars['high'].astype('f8') + bars['low'] + bars['close']) / 3.0
+        frame = pd.DataFrame({'session': sessions, 'pv': typical * bars['volume'], 'volume': bars['volume'].astype('f8')})
+        cumulative = frame.groupby('session')[['pv', 'volume']].cumsum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = np.where(cumulative['volume'] > 0, cumulative['pv'] / cumulative['volume'], NAN)
+        values = {'value': vwap}
+        if len(bars) > 1:
+            self._session = int(sessions[-2])
+            self._pv = float(cumulative['pv'].iloc[-2])
+            self._volume = float(cumulative['volume'].iloc[-2])
+        return self._finish_seed(bars, values)
+
+    def update(self, bar):
+        self._undo = (self._session, self._pv, self._volume)
+        session = session_start(int(bar['t']))
+        if session != self._session:
+            self._session, self._pv, self._volume = session, 0.0, 0.0
+        volume = float(bar['volume'])
+        self._pv += (float(bar['high']) + float(bar['low']) + float(bar['close'])) / 3.0 * volume
+        self._volume += volume
+        return {'value': self._pv / self._volume if self._volume > 0 else NAN}
+
+    def _rollback(self):
+        self._session, self._pv, self._volume = self._undo
+
+
+INDICATORS = {indicator.name: indicator for indicator in (SMA, EMA, RSI, MACD, BollingerBands, VWAP)}
+MAX_PARAM = 1000
+
+
+# parse a study like 'sma:20', 'macd:12:26:9', 'bbands:20:2' or 'vwap'
+# returns (name, params), raises ValueError for anything unknown or out of range
+def parse_study(study):
+    name, *raw_params = study.strip().lower().split(':')
+    if name not in INDICATORS:
+        raise ValueError(f'Unknown indicator: {name}')
+    param_types = INDICATORS[name].param_types
+    if len(raw_params) > len(param_types):
+        raise ValueError(f'Wrong number of parameters: {study}')
+    # int('1.5') fails, so sma:1.5 is rejected instead of becoming a second key for sma:1
+    params = tuple(param_type(param) for param_type, param in zip(param_types, raw_params))
+    if any(not 0 < param <= MAX_PARAM for param in params):
+        raise ValueError(f'Parameter out of range: {study}')
+    return name, params
+
+
+class _Series:
+    __slots__ = ('indicator', 't', 'values')
+
+    def __init__(self, indicator, bars, values):
+        self.indicator = indicator
+        self.t = bars['t'].tolist()
+        self.values = {output: column.tolist() for output, column in values.items()}
+
+    def apply(self, bar, max_points):
+        t = int(bar['t'])
+        if t < self.t[-1]:
+            return
+        if t == self.t[-1]:
+            result = self.indicator.revise(bar)
+            for output, value in result.items():
+                self.values[output][-1] = value
+            return
+        result = self.indicator.update(bar)
+        self.t.append(t)
+        for output, value in result.items():
+            self.values[output].append(value)
+        if len(self.t) > max_points:
+            drop = len(self.t) - max_points
+            del self.t[:drop]
+            for column in self.values.values():
+                del column[:drop]
+
+    def as_dict(self):
+        series = {'t': list(self.t)}
+        for output, column in self.values.items():
+            series[output] = [None if math.isnan(value) else value for value in column]
+        return series
+
+
+# Cache of indicator series per (symbol, interval, name, params).
+# A series is computed vectorized once, then kept current one bar at a time.
+class IndicatorEngine:
+
+    def __init__(self, max_entries=256, max_points=5000):
+        self._max_entries = max_entries
+        self._max_points = max_points
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    # last bar time of a cached series, None when it has to be computed from scratch
+    def last_time(self, symbol, interval, name, params):
+        with self._lock:
+            series = self._entries.get((symbol, interval, name, params))
+            return series.t[-1] if series is not None and series.t else None
+
+    # bring a series up to date with bars and return it as {'t': [...], output: [...]}
+    # bars may start anywhere at or before last_time(), only the bars from there on are folded in;
+    # bars that do not reach back to last_time() replace the series
+    def get(self, symbol, interval, name, params, bars):
+        key = (symbol, interval, name, params)
+        with self._lock:
+            series = self._entries.get(key)
+            if series is not None and not series.t:
+                # seeded before the symbol had bars, there is nothing to fold new bars into
+                series = None
+            if series is not None:
+                tail = bars[np.searchsorted(bars['t'], series.t[-1]):]
+                if len(tail) and int(tail['t'][0]) == series.t[-1]:
+                    bars = tail
+                else:
+                    series = None
+            if series is None:
+                indicator = INDICATORS[name](*params)
+                series = _Series(indicator, bars, indicator.seed(bars))
+                self._entries[key] = series
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                for bar in bars:
+                    series.apply(bar, self._max_points)
+            self._entries.move_to_end(key)
+            return series.as_dict()
+
+    # feed new bars of a symbol/interval to every cached series, called by the live pollers
+    def advance(self, symbol, interval, bars):
+        with self._lock:
+            for key, series in self._entries.items():
+                if key[0] == symbol and key[1] == interval and series.t:
+                    for bar in bars:
+                        series.apply(bar, self._max_points)
+
+# Singleton to be used in other modules
+indicator_engine_singleton = IndicatorEngine()
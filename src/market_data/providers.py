@@ -0,0 +1,238 @@
+import math
+import os
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from src.market_data.aggregator import EXCHANGE_TZ
+from src.market_data.scheduler import request_budget_singleton
+
+# yfinance | local
+MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yfinance')
+# folder of <SYMBOL>_<interval>.csv files for the local provider, relative to the working directory
+MARKET_DATA_FIXTURES = os.getenv('MARKET_DATA_FIXTURES', 'tests/fixtures/market_data/')
+LOCAL_PROVIDER_SEED = int(os.getenv('LOCAL_PROVIDER_SEED', '0'))
+
+# Every provider returns history the way yfinance does: a DatetimeIndex in exchange time
+# named Datetime (intraday) or Date (daily and longer) and these columns
+HISTORY_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits')
+
+# yfinance's period / interval names in seconds
+PERIOD_SECONDS = {
+    '1d': 86400,
+    '5d': 5 * 86400,
+    '1mo': 31 * 86400,
+    '3mo': 92 * 86400,
+    '6mo': 183 * 86400,
+    '1y': 366 * 86400,
+    '2y': 731 * 86400,
+    '5y': 1827 * 86400,
+    '10y': 3653 * 86400,
+}
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '2m': 120,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '60m': 3600,
+    '90m': 5400,
+    '1h': 3600,
+    '1d': 86400,
+    '5d': 5 * 86400,
+    '1wk': 7 * 86400,
+    '1mo': 30 * 86400,
+    '3mo': 91 * 86400,
+}
+
+# Daily bars over a few sessions are enough to read today's price and open
+QUOTE_PERIOD = '5d'
+QUOTE_INTERVAL = '1d'
+
+
+# current price and open from the last bar of a history frame, None without data
+def quote_from_history(df):
+    if df is None or df.empty:
+        return None
+    last = df.iloc[-1]
+    current_price = float(last['Close'])
+    open_price = float(last['Open'])
+    if math.isnan(current_price) or math.isnan(open_price):
+        return None
+    return {'currentPrice': current_price, 'openPrice': open_price}
+
+def period_seconds(period):
+    if period in ('ytd', 'max'):
+        return PERIOD_SECONDS['10y'] if period == 'max' else PERIOD_SECONDS['1y']
+    if period not in PERIOD_SECONDS:
+        raise ValueError(f'Unknown period: {period}')
+    return PERIOD_SECONDS[period]
+
+def interval_seconds(interval):
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f'Unknown interval: {interval}')
+    return INTERVAL_SECONDS[interval]
+
+
+# Where market data comes from. history() is the one method a provider must implement,
+# batches and quotes fall back to calling it once per symbol.
+class MarketDataProvider(ABC):
+    name = None
+
+    # bars of one symbol, either the last `period` or everything from `start` (epoch seconds) on
+    @abstractmethod
+    def history(self, symbol, period=None, interval='1d', start=None):
+        pass
+
+    # {symbol: history frame}, symbols without data are left out
+    def batch_history(self, symbols, period, interval):
+        frames = {}
+        for symbol in symbols:
+            df = self.history(symbol, period=period, interval=interval)
+            if df is not None and not df.empty:
+                frames[symbol] = df
+        return frames
+
+    # {'currentPrice', 'openPrice'} or None
+    def latest_quote(self, symbol):
+        return quote_from_history(self.history(symbol, period=QUOTE_PERIOD, interval=QUOTE_INTERVAL))
+
+    # {symbol: quote or None}
+    def batch_quotes(self, symbols):
+        frames = self.batch_history(list(symbols), QUOTE_PERIOD, QUOTE_INTERVAL)
+        return {symbol: quote_from_history(frames.get(symbol)) for symbol in symbols}
+
+
+# Yahoo Finance, every call takes a token from the shared request budget
+class YFinanceProvider(MarketDataProvider):
+    name = 'yfinance'
+
+    def history(self, symbol, period=None, interval='1d', start=None):
+        request_budget_singleton.acquire()
+        if start is not None:
+            return yf.Ticker(symbol).history(start=datetime.fromtimestamp(start, tz=timezone.utc), interval=interval)
+        return yf.Ticker(symbol).history(period=period, interval=interval)
+
+    # one batched download for many symbols
+    def batch_history(self, symbols, period, interval):
+        request_budget_singleton.acquire()
+        frame = yf.download(symbols, period=period, interval=interval, group_by='ticker', threads=True, progress=False)
+        if frame.columns.nlevels == 1:
+            # a single ticker comes back without the ticker level
+            return {symbols[0]: frame.dropna(how='all')}
+        tickers = frame.columns.get_level_values(0)
+        return {symbol: frame[symbol].dropna(how='all') for symbol in symbols if symbol in tickers}
+
+
+# Offline provider for tests, benchmarks and demos.
+# A <SYMBOL>_<interval>.csv file in the fixtures folder is served as recorded
+# (periods count back from its last bar); any other symbol gets a seeded random walk that is the
+# same for the same symbol, interval and seed, and keeps growing bar by bar as the clock moves.
+class LocalProvider(MarketDataProvider):
+    name = 'local'
+
+    # how far back a generated series reaches, by interval
+    INTRADAY_LOOKBACK = 60 * 86400
+    DAILY_LOOKBACK = 3653 * 86400
+
+    def __init__(self, fixtures=MARKET_DATA_FIXTURES, seed=LOCAL_PROVIDER_SEED, clock=time.time):
+        self._fixtures = fixtures
+        self._seed = seed
+        self._clock = clock
+        self._lock = Lock()
+        self._loaded = {}
+        self._walks = {}
+
+    def history(self, symbol, period=None, interval='1d', start=None):
+        symbol = symbol.strip().upper()
+        df = self._fixture(symbol, interval)
+        if df is None:
+            df = self._walk(symbol, interval)
+            end = self._clock()
+        else:
+            end = df.index[-1].timestamp() if len(df) else self._clock()
+        if start is not None:
+            return df[df.index >= pd.Timestamp(start, unit='s', tz='UTC')]
+        return df[df.index > pd.Timestamp(end - period_seconds(period or '1mo'), unit='s', tz='UTC')]
+
+    def _fixture(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            if key in self._loaded:
+                return self._loaded[key]
+        df = None
+        path = os.path.join(self._fixtures, f'{symbol}_{interval}.csv')
+        if os.path.exists(path):
+            df = pd.read_csv(path, index_col=0)
+        if df is not None:
+            index = pd.to_datetime(df.index)
+            # timestamps without a zone are exchange time, like yfinance writes them
+            df.index = index.tz_localize(EXCHANGE_TZ) if index.tz is None else index.tz_convert(EXCHANGE_TZ)
+            df.index.name = 'Date' if interval_seconds(interval) >= 86400 else 'Datetime'
+            for column in HISTORY_COLUMNS:
+                if column not in df.columns:
+                    df[column] = 0.0
+            df = df[list(HISTORY_COLUMNS)].sort_index()
+        with self._lock:
+            self._loaded[key] = df
+        return df
+
+    # the generated series of a symbol, extended up to the current bar
+    def _walk(self, symbol, interval):
+        step = interval_seconds(interval)
+        now = int(self._clock()) // step * step
+        key = (symbol, interval)
+        with self._lock:
+            walk = self._walks.get(key)
+            if walk is None:
+                lookback = self.INTRADAY_LOOKBACK if step < 86400 else self.DAILY_LOOKBACK
+                rng = np.random.default_rng([self._seed, zlib.crc32(f'{symbol}_{interval}'.encode())])
+                # start somewhere between 20 and 500 so symbols do not all look alike
+                walk = self._walks[key] = {'rng': rng, 't': now - lookback, 'close': float(rng.uniform(20, 500)), 'frame': None}
+            if walk['frame'] is None or walk['t'] < now:
+                walk['frame'] = self._extend(walk, step, now, interval)
+            return walk['frame']
+
+    @staticmethod
+    def _extend(walk, step, now, interval):
+        count = (now - walk['t']) // step + (1 if walk['frame'] is None else 0)
+        first = walk['t'] + (0 if walk['frame'] is None else step)
+        rng = walk['rng']
+        # per-bar volatility scaled so a day moves about 1.5% whatever the interval
+        sigma = 0.015 * math.sqrt(step / 86400)
+        closes = walk['close'] * np.exp(np.cumsum(rng.normal(0, sigma, count)))
+        opens = np.concatenate(([walk['close']], closes[:-1]))
+        spread = np.abs(rng.normal(0, sigma / 2, count)) * closes
+        frame = pd.DataFrame({
+            'Open': opens,
+            'High': np.maximum(opens, closes) + spread,
+            'Low': np.minimum(opens, closes) - spread,
+            'Close': closes,
+            'Volume': rng.integers(1_000, 100_000, count).astype('f8'),
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        }, index=pd.to_datetime(first + step * np.arange(count), unit='s', utc=True).tz_convert(EXCHANGE_TZ))
+        frame.index.name = 'Date' if step >= 86400 else 'Datetime'
+        walk['t'] = now
+        walk['close'] = float(closes[-1]) if count else walk['close']
+        return frame if walk['frame'] is None else pd.concat([walk['frame'], frame])
+
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    LocalProvider.name: LocalProvider,
+}
+
+def make_provider(name):
+    if name not in PROVIDERS:
+        raise ValueError(f'MARKET_DATA_PROVIDER must be one of {tuple(PROVIDERS)}, got {name!r}')
+    return PROVIDERS[name]()
+
+# Singleton to be used in other modules
+market_data_provider_singleton = make_provider(MARKET_DATA_PROVIDER)
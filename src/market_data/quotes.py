@@ -0,0 +1,14 @@
+from src.market_data.cache import market_data_cache_singleton
+# the quote key is shared with /display_watchlist so both hit the same cache entries
+from src.market_data.providers import QUOTE_INTERVAL, QUOTE_PERIOD, quote_from_history
+
+# Upper bound on symbols per /quotes request
+MAX_QUOTE_SYMBOLS = 100
+
+
+# current price and open for many symbols from one batched upstream download
+# returns {symbol: {'currentPrice', 'openPrice'}}, None for symbols without data
+def get_quotes(symbols, cache=market_data_cache_singleton):
+    symbols = list(dict.fromkeys(cache.make_key(symbol, QUOTE_PERIOD, QUOTE_INTERVAL)[0] for symbol in symbols))
+    frames = cache.get_history_many(symbols, QUOTE_PERIOD, QUOTE_INTERVAL)
+    return {symbol: quote_from_history(frames.get(symbol)) for symbol in symbols}
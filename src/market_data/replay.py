@@ -0,0 +1,114 @@
+import os
+import re
+import time
+from threading import Lock
+
+import numpy as np
+
+# live: poll the upstream, capture: poll and record every live bar, replay: play a recording back
+MODES = ('live', 'capture', 'replay')
+MARKET_DATA_MODE = os.getenv('MARKET_DATA_MODE', 'live')
+if MARKET_DATA_MODE not in MODES:
+    raise ValueError(f'MARKET_DATA_MODE must be one of {MODES}, got {MARKET_DATA_MODE!r}')
+
+TICK_LOG_FOLDER = os.getenv('TICK_LOG_FOLDER', 'data/ticks/')
+# 1 plays back in real time, 10 ten times faster, 0 as fast as possible
+REPLAY_SPEED = float(os.getenv('REPLAY_SPEED', '1'))
+# a recording spanning a night or a weekend should not stall the replay, longer gaps are cut to this
+MAX_REPLAY_GAP_SECONDS = 60
+
+# One fixed-size record per live bar update: when it was seen, then the bar itself
+TICK_LOG_DTYPE = np.dtype([
+    ('at', '<f8'),
+    ('t', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+TICK_LOG_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def tick_log_path(folder, symbol):
+    return os.path.join(folder, re.sub(r'[^A-Z0-9.^=-]', '_', symbol.strip().upper()) + '.ticks')
+
+def read_tick_log(folder, symbol):
+    path = tick_log_path(folder, symbol)
+    if not os.path.exists(path):
+        return np.empty(0, dtype=TICK_LOG_DTYPE)
+    # a torn record at the end of the file is ignored
+    return np.fromfile(path, dtype=TICK_LOG_DTYPE, count=os.path.getsize(path) // TICK_LOG_DTYPE.itemsize)
+
+
+# Appends the live bars a poller publishes to one log file per symbol.
+# Bars identical to the last one recorded for the symbol are skipped.
+class TickRecorder:
+
+    def __init__(self, folder=TICK_LOG_FOLDER, clock=time.time):
+        self._folder = folder
+        self._clock = clock
+        self._lock = Lock()
+        self._last = {}
+
+    # bar is a dict (t, open, high, low, close, volume), returns True when it was written
+    def record(self, symbol, bar):
+        record = np.zeros(1, dtype=TICK_LOG_DTYPE)
+        record['at'] = self._clock()
+        record['t'] = bar['t']
+        for field in TICK_LOG_FIELDS:
+            record[field] = bar[field]
+        key = tuple(bar[field] for field in ('t', *TICK_LOG_FIELDS))
+        with self._lock:
+            if self._last.get(symbol) == key:
+                return False
+            self._last[symbol] = key
+            os.makedirs(self._folder, exist_ok=True)
+            with open(tick_log_path(self._folder, symbol), 'ab') as file:
+                file.write(record.tobytes())
+        return True
+
+
+# Plays a recorded tick log back through publish(symbol, bar), keeping the recorded spacing
+# divided by speed. Looping shifts bar times forward by the recording's span so they never go back.
+class TickReplayer:
+
+    def __init__(self, folder=TICK_LOG_FOLDER, speed=REPLAY_SPEED, loop=True, sleep=time.sleep):
+        if speed < 0:
+            raise ValueError('Replay speed must not be negative')
+        self._folder = folder
+        self._speed = speed
+        self._loop = loop
+        self._sleep = sleep
+
+    # replay until the log ends (without loop) or keep_going() returns False,
+    # returns how many bars were published
+    def replay(self, symbol, publish, keep_going):
+        records = read_tick_log(self._folder, symbol)
+        if not len(records):
+            print(f'No recorded ticks for {symbol} in {self._folder}')
+            return 0
+        span = int(records['t'][-1] - records['t'][0]) + 60
+        offset = 0
+        published = 0
+        while True:
+            previous_at = None
+            for record in records:
+                if previous_at is not None:
+                    gap = min(float(record['at'] - previous_at), MAX_REPLAY_GAP_SECONDS)
+                    # at full speed still yield, so other greenlets get to run
+                    self._sleep(gap / self._speed if self._speed > 0 else 0)
+                previous_at = record['at']
+                if not keep_going():
+                    return published
+                bar = {'t': int(record['t']) + offset}
+                for field in TICK_LOG_FIELDS:
+                    bar[field] = float(record[field])
+                publish(symbol, bar)
+                published += 1
+            if not self._loop:
+                return published
+            offset += span
+
+# Singleton to be used in other modules
+tick_recorder_singleton = TickRecorder()
@@ -0,0 +1,55 @@
+import numpy as np
+
+from src.market_data.aggregator import EXCHANGE_TZ
+
+# Chart resolutions a client may ask for, with their bucket size in seconds
+# and the matching pandas resample rule
+RESOLUTIONS = {
+    '1m': (60, '1min'),
+    '2m': (120, '2min'),
+    '5m': (300, '5min'),
+    '15m': (900, '15min'),
+    '30m': (1800, '30min'),
+    '1h': (3600, '1h'),
+    '4h': (14400, '4h'),
+    '1d': (86400, '1D'),
+}
+
+# How each column of a bucket is built from the bars inside it
+OHLCV_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+
+# smallest resolution that fits the bars of df into max_points buckets
+# falls back to the coarsest resolution when nothing fits
+def pick_resolution(df, max_points):
+    if df.empty:
+        return '1m'
+    seconds = df['date'].to_numpy(dtype='datetime64[s]').astype('i8')
+    for resolution, (bucket, _) in RESOLUTIONS.items():
+        if np.unique(seconds // bucket).size <= max_points:
+            return resolution
+    return resolution
+
+# aggregate 1m bars (date, open, high, low, close, volume) into coarser OHLCV buckets
+# resolution wins over max_points when both are given.
+# Buckets are cut in exchange time, so a 1d candle is one exchange trading date (after-hours
+# bars past UTC midnight stay in their session) and 4h candles start at exchange midnight;
+# dates go back out in UTC like the 1m bars.
+def downsample_bars(df, resolution=None, max_points=None):
+    if resolution is None and max_points is not None:
+        resolution = pick_resolution(df, max_points)
+    if resolution is None or resolution == '1m' or df.empty:
+        return df
+    _, rule = RESOLUTIONS[resolution]
+    local = df.assign(date=df['date'].dt.tz_convert(EXCHANGE_TZ))
+    buckets = local.resample(rule, on='date', label='left', closed='left').agg(OHLCV_AGG)
+    # buckets without a single bar (nights, weekends) come back as NaN rows
+    buckets = buckets.dropna(subset=['open']).reset_index()
+    buckets['date'] = buckets['date'].dt.tz_convert('UTC')
+    return buckets
@@ -0,0 +1,221 @@
+import os
+import random
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+from functools import lru_cache
+from threading import Lock
+
+import gevent
+from src.market_data.aggregator import EXCHANGE_TZ
+from src.market_data.executor import FETCH_TIMEOUT, MarketDataUnavailable
+
+# NYSE / NASDAQ session times, exchange local time
+PRE_MARKET_OPEN = dt_time(4, 0)
+REGULAR_OPEN = dt_time(9, 30)
+REGULAR_CLOSE = dt_time(16, 0)
+EARLY_CLOSE = dt_time(13, 0)
+AFTER_HOURS_CLOSE = dt_time(20, 0)
+
+# Market phases
+OPEN = 'open'
+EXTENDED = 'extended'
+CLOSED = 'closed'
+
+# Seconds between polls of one symbol in each phase
+OPEN_POLL_SECONDS = 5
+EXTENDED_POLL_SECONDS = 30
+# while closed a poller sleeps until the next pre-market open, waking at least this often
+CLOSED_MAX_SLEEP_SECONDS = 15 * 60
+
+# Exponential backoff after failed polls
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 5 * 60
+
+# Global upstream budget shared by every symbol
+UPSTREAM_REQUESTS_PER_SECOND = float(os.getenv('UPSTREAM_REQUESTS_PER_SECOND', '5'))
+UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', '20'))
+# Longest an upstream call waits for a token: half the fetch deadline, the call itself needs the rest.
+# Waiting longer would only keep a pool worker busy for a caller that already gave up.
+BUDGET_WAIT_SECONDS = FETCH_TIMEOUT / 2
+
+
+def _nth_weekday(year, month, weekday, n):
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+def _last_weekday(year, month, weekday):
+    last = date(year, month + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+# Gregorian Easter Sunday (anonymous algorithm)
+def _easter(year):
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+# a holiday on Saturday is observed on Friday, on Sunday on Monday
+def _observed(day):
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+# full-day NYSE holidays of a year
+@lru_cache(maxsize=16)
+def exchange_holidays(year):
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),                # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),                # Washington's Birthday
+        _easter(year) - timedelta(days=2),          # Good Friday
+        _last_weekday(year, 5, 0),                  # Memorial Day
+        _observed(date(year, 7, 4)),                # Independence Day
+        _nth_weekday(year, 9, 0, 1),                # Labor Day
+        _nth_weekday(year, 11, 3, 4),               # Thanksgiving
+        _observed(date(year, 12, 25)),              # Christmas
+    }
+    # New Year's Day falling on a Saturday is not moved back into the old year
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+# trading days that close at 1pm
+@lru_cache(maxsize=16)
+def early_closes(year):
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}   # day after Thanksgiving
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 5:
+            days.add(day)
+    return frozenset(days - exchange_holidays(year))
+
+
+class MarketCalendar:
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in exchange_holidays(day.year)
+
+    # (pre-market open, regular open, regular close, after-hours close) of a trading day, None otherwise
+    def session(self, day):
+        if not self.is_trading_day(day):
+            return None
+        close = EARLY_CLOSE if day in early_closes(day.year) else REGULAR_CLOSE
+        return tuple(datetime.combine(day, moment, EXCHANGE_TZ)
+                     for moment in (PRE_MARKET_OPEN, REGULAR_OPEN, close, AFTER_HOURS_CLOSE))
+
+    def phase(self, now=None):
+        now = self._local(now)
+        session = self.session(now.date())
+        if session is None or not session[0] <= now < session[3]:
+            return CLOSED
+        if session[1] <= now < session[2]:
+            return OPEN
+        return EXTENDED
+
+    # next moment pre-market trading starts, strictly after now
+    def next_session_start(self, now=None):
+        now = self._local(now)
+        day = now.date()
+        for _ in range(15):
+            session = self.session(day)
+            if session is not None and session[0] > now:
+                return session[0]
+            day += timedelta(days=1)
+        return now + timedelta(days=1)
+
+    @staticmethod
+    def _local(now):
+        if now is None:
+            return datetime.now(EXCHANGE_TZ)
+        if isinstance(now, (int, float)):
+            return datetime.fromtimestamp(now, EXCHANGE_TZ)
+        return now.astimezone(EXCHANGE_TZ)
+
+
+# Picks how long each poller sleeps: fast while the market is open, slower in extended hours,
+# asleep until the next session while closed, and exponentially backed off after errors.
+class PollScheduler:
+
+    def __init__(self, calendar=None, clock=time.time):
+        self._calendar = calendar or MarketCalendar()
+        self._clock = clock
+        self._lock = Lock()
+        self._failures = {}
+
+    def record_success(self, symbol):
+        self.forget(symbol)
+
+    def record_failure(self, symbol):
+        with self._lock:
+            self._failures[symbol] = self._failures.get(symbol, 0) + 1
+
+    def next_delay(self, symbol):
+        with self._lock:
+            failures = self._failures.get(symbol, 0)
+        if failures:
+            backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (failures - 1))
+            # jitter so pollers that failed together do not retry together
+            return backoff * random.uniform(0.8, 1.2)
+
+        now = self._clock()
+        phase = self._calendar.phase(now)
+        if phase == OPEN:
+            return OPEN_POLL_SECONDS
+        if phase == EXTENDED:
+            return EXTENDED_POLL_SECONDS
+        until_open = self._calendar.next_session_start(now).timestamp() - now
+        return max(OPEN_POLL_SECONDS, min(until_open, CLOSED_MAX_SLEEP_SECONDS))
+
+    def forget(self, symbol):
+        with self._lock:
+            self._failures.pop(symbol, None)
+
+
+class RequestBudgetExceeded(MarketDataUnavailable):
+    pass
+
+
+# Token bucket shared by every upstream call so the total request rate stays under the
+# provider's limits no matter how many symbols are watched.
+# Waits for a token with gevent.sleep, which yields on the hub and just sleeps on a pool thread.
+class RequestBudget:
+
+    def __init__(self, rate=UPSTREAM_REQUESTS_PER_SECOND, burst=UPSTREAM_BURST, clock=time.monotonic, sleep=gevent.sleep):
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    # take one token, waiting for it up to timeout seconds, raises RequestBudgetExceeded
+    # right away when the token would come later than that
+    def acquire(self, timeout=BUDGET_WAIT_SECONDS):
+        deadline = self._clock() + timeout
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            if now + wait > deadline:
+                raise RequestBudgetExceeded('Upstream request budget exhausted')
+            self._sleep(wait)
+
+# Singletons to be used in other modules
+market_calendar_singleton = MarketCalendar()
+poll_scheduler_singleton = PollScheduler(market_calendar_singleton)
+request_budget_singleton = RequestBudget()
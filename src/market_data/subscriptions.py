@@ -0,0 +1,105 @@
+import os
+import re
+from threading import Lock
+
+# ticker symbols as yfinance writes them: SPY, BRK.B, ^GSPC, BTC-USD, EURUSD=X
+SYMBOL_PATTERN = re.compile(r'[A-Z0-9^][A-Z0-9.^=-]{0,11}')
+# symbols with a live poller at once, and symbols one client may watch at once
+MAX_POLLED_SYMBOLS = int(os.getenv('MAX_POLLED_SYMBOLS', '200'))
+MAX_CLIENT_SYMBOLS = int(os.getenv('MAX_CLIENT_SYMBOLS', '10'))
+
+
+# a subscription that would go over one of the limits above
+class TooManySubscriptions(Exception):
+    pass
+
+
+class SubscriptionManager:
+
+    def __init__(self, max_polled=MAX_POLLED_SYMBOLS, max_per_client=MAX_CLIENT_SYMBOLS):
+        self._max_polled = max_polled
+        self._max_per_client = max_per_client
+        self._lock = Lock()
+        # symbol -> set of socket ids watching it
+        self._subscribers = {}
+        # socket id -> set of symbols it watches
+        self._client_symbols = {}
+        # symbols that currently have a poller running
+        self._polling = set()
+
+    # normalize a ticker so 'spy' and 'SPY' share one room and one poller,
+    # None for anything that cannot be a ticker symbol
+    @staticmethod
+    def normalize(symbol):
+        if not symbol or not isinstance(symbol, str):
+            return None
+        symbol = symbol.strip().upper()
+        return symbol if SYMBOL_PATTERN.fullmatch(symbol) else None
+
+    # add a client to a symbol's subscribers
+    # returns True if the caller must start a poller for the symbol,
+    # raises TooManySubscriptions instead of starting pollers without bound
+    def subscribe(self, sid, symbol):
+        with self._lock:
+            watching = self._client_symbols.get(sid, ())
+            if symbol not in watching and len(watching) >= self._max_per_client:
+                raise TooManySubscriptions(f'A client can watch at most {self._max_per_client} symbols')
+            if symbol not in self._polling and len(self._polling) >= self._max_polled:
+                raise TooManySubscriptions(f'At most {self._max_polled} symbols can be watched at once')
+            self._subscribers.setdefault(symbol, set()).add(sid)
+            self._client_symbols.setdefault(sid, set()).add(symbol)
+            if symbol in self._polling:
+                return False
+            self._polling.add(symbol)
+            return True
+
+    # remove a client from a symbol's subscribers
+    def unsubscribe(self, sid, symbol):
+        with self._lock:
+            self._discard(sid, symbol)
+
+    # remove a client from every symbol it watches (on disconnect)
+    # returns the symbols the client was watching
+    def remove_client(self, sid):
+        with self._lock:
+            symbols = self._client_symbols.pop(sid, set())
+            for symbol in symbols:
+                subscribers = self._subscribers.get(symbol)
+                if subscribers is not None:
+                    subscribers.discard(sid)
+                    if not subscribers:
+                        del self._subscribers[symbol]
+            return symbols
+
+    # called by a poller before each cycle; once the last subscriber has left the
+    # poller is marked stopped under the same lock, so a new subscriber arriving
+    # afterwards always starts a fresh poller instead of attaching to a dead one
+    def keep_polling(self, symbol):
+        with self._lock:
+            if self._subscribers.get(symbol):
+                return True
+            self._polling.discard(symbol)
+            return False
+
+    def subscriber_count(self, symbol):
+        with self._lock:
+            return len(self._subscribers.get(symbol, ()))
+
+    def watched_symbols(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def _discard(self, sid, symbol):
+        subscribers = self._subscribers.get(symbol)
+        if subscribers is not None:
+            subscribers.discard(sid)
+            if not subscribers:
+                del self._subscribers[symbol]
+        symbols = self._client_symbols.get(sid)
+        if symbols is not None:
+            symbols.discard(symbol)
+            if not symbols:
+                del self._client_symbols[sid]
+
+# Singleton to be used in other modules
+subscription_manager_singleton = SubscriptionManager()
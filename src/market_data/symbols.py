@@ -0,0 +1,105 @@
+import csv
+import os
+import re
+import time
+from bisect import bisect_left
+from threading import Lock
+
+LISTINGS_PATH = os.path.join(os.path.dirname(__file__), 'listings.csv')
+
+MAX_RESULTS = 25
+DEFAULT_RESULTS = 10
+# how long (seconds) watch counts are trusted before they are loaded again
+POPULARITY_TTL = 300
+
+# Match quality, best first: the exact ticker, a ticker prefix, a word of the company name
+EXACT_SYMBOL = 0
+SYMBOL_PREFIX = 1
+NAME_PREFIX = 2
+
+
+def load_listings(path=LISTINGS_PATH):
+    with open(path, newline='', encoding='utf-8') as file:
+        return [(row['symbol'], row['name']) for row in csv.DictReader(file)]
+
+
+# Prefix index over ticker symbols and company names.
+# Every searchable key (the ticker and each word of the name onward, lower case) is kept in one
+# sorted list, so a lookup is two bisects plus a walk over the matching range.
+# Results are ranked by match quality, then by how many watchlists the ticker is on.
+class SymbolIndex:
+
+    def __init__(self, listings, popularity_loader=None, popularity_ttl=POPULARITY_TTL, clock=time.monotonic):
+        self._names = {}
+        entries = []
+        for symbol, name in listings:
+            symbol = symbol.strip().upper()
+            name = name.strip()
+            if not symbol or symbol in self._names:
+                continue
+            self._names[symbol] = name
+            entries.append((symbol.lower(), symbol, True))
+            lowered = name.lower()
+            for match in re.finditer(r'[a-z0-9]+', lowered):
+                entries.append((lowered[match.start():], symbol, False))
+        entries.sort()
+        self._keys = [key for key, _, _ in entries]
+        self._entries = [(symbol, is_symbol) for _, symbol, is_symbol in entries]
+
+        self._popularity_loader = popularity_loader
+        self._popularity_ttl = popularity_ttl
+        self._clock = clock
+        self._lock = Lock()
+        self._popularity = {}
+        self._popularity_loaded = None
+
+    # loader() returns {symbol: watch count}
+    def set_popularity_loader(self, loader):
+        with self._lock:
+            self._popularity_loader = loader
+            self._popularity_loaded = None
+
+    def name(self, symbol):
+        return self._names.get(symbol.strip().upper())
+
+    def search(self, query, limit=DEFAULT_RESULTS):
+        query = query.strip().lower()
+        if not query or limit < 1:
+            return []
+        start = bisect_left(self._keys, query)
+        # every key starting with the query sorts before query + '\uffff'
+        end = bisect_left(self._keys, query + '\uffff', start)
+
+        best = {}
+        for key, (symbol, is_symbol) in zip(self._keys[start:end], self._entries[start:end]):
+            if is_symbol:
+                quality = EXACT_SYMBOL if key == query else SYMBOL_PREFIX
+            else:
+                quality = NAME_PREFIX
+            if quality < best.get(symbol, NAME_PREFIX + 1):
+                best[symbol] = quality
+
+        popularity = self._current_popularity()
+        ranked = sorted(best, key=lambda symbol: (best[symbol], -popularity.get(symbol, 0), symbol))
+        return [{'symbol': symbol, 'name': self._names[symbol]} for symbol in ranked[:limit]]
+
+    def _current_popularity(self):
+        with self._lock:
+            loader = self._popularity_loader
+            now = self._clock()
+            if loader is None or (self._popularity_loaded is not None and now - self._popularity_loaded < self._popularity_ttl):
+                return self._popularity
+            # only one caller reloads, the rest keep using the current counts
+            self._popularity_loaded = now
+        try:
+            counts = loader()
+        except Exception as e:
+            print(f'Could not load symbol popularity: {e}')
+            return self._popularity
+        popularity = {symbol.strip().upper(): count for symbol, count in counts.items()}
+        with self._lock:
+            self._popularity = popularity
+        return popularity
+
+# Singleton to be used in other modules
+symbol_index_singleton = SymbolIndex(load_listings())
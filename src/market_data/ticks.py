@@ -0,0 +1,72 @@
+from threading import Lock
+
+# Short keys of a tick on the wire and the bar fields they carry
+TICK_FIELDS = (('o', 'open'), ('h', 'high'), ('l', 'low'), ('c', 'close'), ('v', 'volume'))
+
+
+# tick carrying only what changed between two versions of a bar
+# a new bar (or no previous one) gets every field, an unchanged bar gets None
+def make_tick(bar, previous=None):
+    tick = {'t': bar['t']}
+    same_bar = previous is not None and previous['t'] == bar['t']
+    for key, field in TICK_FIELDS:
+        if not same_bar or previous[field] != bar[field]:
+            tick[key] = bar[field]
+    if same_bar and len(tick) == 1:
+        return None
+    return tick
+
+def full_tick(bar):
+    tick = {'t': bar['t']}
+    for key, field in TICK_FIELDS:
+        tick[key] = bar[field]
+    return tick
+
+
+# Collects live bars from the pollers and turns them into compact ticks.
+# Ticks published between two flushes are coalesced: one list per symbol,
+# with changes to the same bar merged into a single tick.
+class TickPublisher:
+
+    def __init__(self):
+        self._lock = Lock()
+        # symbol -> latest full bar, used for diffs and for snapshots to new subscribers
+        self._latest = {}
+        # symbol -> {bar time: merged tick} waiting for the next flush
+        self._pending = {}
+
+    # returns the tick queued for the bar, None when the bar did not change
+    def publish(self, symbol, bar):
+        with self._lock:
+            tick = make_tick(bar, self._latest.get(symbol))
+            self._latest[symbol] = dict(bar)
+            if tick is None:
+                return None
+            pending = self._pending.setdefault(symbol, {})
+            if tick['t'] in pending:
+                pending[tick['t']].update(tick)
+            else:
+                pending[tick['t']] = tick
+            return tick
+
+    # {symbol: [ticks oldest first]} published since the last drain
+    def drain(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        return {symbol: list(ticks.values()) for symbol, ticks in pending.items()}
+
+    # full tick of the latest bar, sent to a client when it subscribes
+    def snapshot(self, symbol):
+        with self._lock:
+            bar = self._latest.get(symbol)
+            return full_tick(bar) if bar is not None else None
+
+    # drop the state of a symbol nobody watches any more
+    def forget(self, symbol):
+        with self._lock:
+            self._latest.pop(symbol, None)
+            self._pending.pop(symbol, None)
+
+# Singleton to be used in other modules
+tick_publisher_singleton = TickPublisher()
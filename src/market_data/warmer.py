@@ -0,0 +1,66 @@
+import os
+import time
+
+from src.market_data.bar_store import bar_store_singleton
+from src.market_data.cache import market_data_cache_singleton
+from src.market_data.executor import FETCH_TIMEOUT, MarketDataUnavailable
+from src.market_data.quotes import QUOTE_INTERVAL, QUOTE_PERIOD
+
+# How many of the most watched tickers are kept warm, and how often (seconds)
+WARM_SYMBOLS = int(os.getenv('CACHE_WARMER_SYMBOLS', '50'))
+WARM_INTERVAL_SECONDS = int(os.getenv('CACHE_WARMER_INTERVAL', '300'))
+# always warmed, whatever the watchlists say (the default chart symbol)
+DEFAULT_WARM_SYMBOLS = ('SPY',)
+
+
+# Keeps the market data of the tickers users care about warm, so the first chart and
+# watchlist loads after a restart hit the cache instead of all waiting on yfinance at once.
+# rank_symbols(limit) returns tickers, most watched first.
+class CacheWarmer:
+
+    def __init__(self, rank_symbols, cache=market_data_cache_singleton, bar_store=bar_store_singleton,
+                 default_symbols=DEFAULT_WARM_SYMBOLS, limit=WARM_SYMBOLS, interval=WARM_INTERVAL_SECONDS, sleep=time.sleep):
+        self._rank_symbols = rank_symbols
+        self._cache = cache
+        self._bar_store = bar_store
+        self._default_symbols = default_symbols
+        self._limit = limit
+        self._interval = interval
+        self._sleep = sleep
+
+    # default symbols first, then the most watched ones
+    def symbols(self):
+        try:
+            ranked = self._rank_symbols(self._limit)
+        except Exception as e:
+            # the database being down should not stop the default symbols from warming
+            print(f'Cache warmer could not rank symbols: {e}')
+            ranked = []
+        symbols = [symbol.strip().upper() for symbol in (*self._default_symbols, *ranked) if symbol and symbol.strip()]
+        return list(dict.fromkeys(symbols))[:self._limit]
+
+    def warm_once(self):
+        symbols = self.symbols()
+        if not symbols:
+            return []
+        # daily series for every watchlist quote in one batched download
+        try:
+            self._cache.get_history_many(symbols, QUOTE_PERIOD, QUOTE_INTERVAL)
+        except Exception as e:
+            print(f'Cache warmer could not load quotes: {e}')
+        # intraday bars one symbol after another on the market data pool, the shared request budget paces them
+        for symbol in symbols:
+            try:
+                self._bar_store.refresh(symbol, timeout=FETCH_TIMEOUT)
+            except (MarketDataUnavailable, ValueError) as e:
+                print(f'Cache warmer could not refresh {symbol}: {e}')
+        return symbols
+
+    def run(self):
+        while True:
+            try:
+                symbols = self.warm_once()
+                print(f'Cache warmer warmed {len(symbols)} symbols')
+            except Exception as e:
+                print(f'Cache warmer failed: {e}')
+            self._sleep(self._interval)
@@ -0,0 +1,31 @@
+import struct
+
+import numpy as np
+
+# Wire formats for chart bars besides pandas' default list of records:
+#   columnar - JSON object of parallel arrays {t, o, h, l, c, v}, t in epoch seconds
+#   binary   - 8 byte header (uint32 bar count, uint32 format version) followed by six
+#              little-endian float64 arrays t, o, h, l, c, v, readable with Float64Array
+CHART_FORMATS = ('records', 'columnar', 'binary')
+
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<II')
+
+COLUMNS = (('o', 'open'), ('h', 'high'), ('l', 'low'), ('c', 'close'), ('v', 'volume'))
+
+
+def epoch_seconds(df):
+    return df['date'].to_numpy(dtype='datetime64[s]').astype('i8')
+
+def to_columnar(df):
+    columnar = {'t': epoch_seconds(df).tolist()}
+    for key, column in COLUMNS:
+        columnar[key] = df[column].to_numpy(dtype='f8').tolist()
+    return columnar
+
+def to_binary(df):
+    arrays = np.empty((len(COLUMNS) + 1, len(df)), dtype='<f8')
+    arrays[0] = epoch_seconds(df)
+    for row, (_, column) in enumerate(COLUMNS, start=1):
+        arrays[row] = df[column].to_numpy(dtype='f8')
+    return BINARY_HEADER.pack(len(df), BINARY_VERSION) + arrays.tobytes()
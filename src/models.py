@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from itsdangerous.url_safe import URLSafeTimedSerializer as Serializer
 from sqlalchemy import CheckConstraint, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from flask_login import UserMixin
 import os
+from src.sanitize import sanitize_html
 # from src import app
 
 db = SQLAlchemy()
@@ -79,24 +82,22 @@ class users(db.Model, UserMixin):
     
 
     # Method to get all of a users followers
-    # returns set of followers usernames 
+    # returns list of followers usernames, in one query
     def get_all_followers(self):
-        followers = []
-        for follower in self.followers.all(): 
-            user = users.query.get(follower.user1_id)
-            if user:
-                followers.append(user.username)
-        return followers
+        rows = db.session.query(users.username)\
+            .join(friendships, friendships.user1_id == users.user_id)\
+            .filter(friendships.user2_id == self.user_id)\
+            .order_by(users.username).all()
+        return [username for username, in rows]
     
     # Method to get all users a user follows
-    # returns set of users followings
+    # returns list of followed usernames, in one query
     def get_all_following(self):
-        followings = []
-        for following in self.following.all():
-            user = users.query.get(following.user2_id)
-            if user:
-                followings.append(user.username)
-        return followings
+        rows = db.session.query(users.username)\
+            .join(friendships, friendships.user2_id == users.user_id)\
+            .filter(friendships.user1_id == self.user_id)\
+            .order_by(users.username).all()
+        return [username for username, in rows]
 
     def __repr__(self) -> str:
         return f'users({self.first_name}, {self.last_name})'
@@ -116,8 +117,9 @@ class Investments(db.Model):
     investment_date = db.Column(db.DateTime, nullable=False, default=func.now())
 
 class Watchlist(db.Model):
+    # a ticker can be on many users' watchlists, once per user
     ticker_symbol = db.Column(db.String(255), primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
     date_added = db.Column(db.DateTime, nullable=False, default=func.now())
 
 #live posts table
@@ -151,6 +153,15 @@ class Post(db.Model):
     # content TEXT,
     content = db.Column(db.Text, nullable = True)
 
+    # content_html TEXT, content sanitized when it is written
+    content_html = db.Column(db.Text, nullable = True)
+
+    # search_vector TSVECTOR, maintained by Postgres from the title (weighted higher) and content,
+    # deferred so feeds never load it
+    search_vector = deferred(db.Column(TSVECTOR, db.Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')", persisted=True)))
+
     # date_posted TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     date_posted = db.Column(db.DateTime, nullable = False, server_default=text('NOW()'))
 
@@ -184,6 +195,18 @@ class Post(db.Model):
     def __repr__(self) -> str:
         return f'Post #{self.post_id} by {self.user_id})'
 
+    # the body safe to render, rows written before content_html existed are sanitized on the fly
+    @property
+    def html(self):
+        return self.content_html if self.content_html is not None else sanitize_html(self.content)
+
+    # feeds page through a user's posts newest first, (date_posted, post_id) is the cursor
+    __table_args__ = (
+        db.Index('post_date_idx', date_posted.desc(), post_id.desc()),
+        db.Index('post_user_date_idx', 'user_id', date_posted.desc(), post_id.desc()),
+        db.Index('post_search_idx', 'search_vector', postgresql_using='gin'),
+    )
+
 #post comments
 class Comment(db.Model):
     # PRIMARY KEY comment_id SERIAL,
@@ -192,6 +215,13 @@ class Comment(db.Model):
     # content TEXT,
     content = db.Column(db.Text, nullable = True)
 
+    # content_html TEXT, content sanitized when it is written
+    content_html = db.Column(db.Text, nullable = True)
+
+    # search_vector TSVECTOR, maintained by Postgres from the content, deferred so threads never load it
+    search_vector = deferred(db.Column(TSVECTOR, db.Computed(
+        "to_tsvector('english', coalesce(content, ''))", persisted=True)))
+
     # date_posted TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     date_posted = db.Column(db.DateTime, nullable = False, server_default=text('NOW()'))
 
@@ -223,6 +253,17 @@ class Comment(db.Model):
 
     def __repr__(self) -> str:
         return f'{self.content}'
+
+    # the body safe to render, rows written before content_html existed are sanitized on the fly
+    @property
+    def html(self):
+        return self.content_html if self.content_html is not None else sanitize_html(self.content)
+
+    # a post's comments are counted and read by post_id
+    __table_args__ = (
+        db.Index('comment_post_idx', 'post_id', date_posted),
+        db.Index('comment_search_idx', 'search_vector', postgresql_using='gin'),
+    )
     
 likes = db.Table(
     'likes',
@@ -233,8 +274,8 @@ likes = db.Table(
 # friendships table
 class friendships(db.Model):
     friendship_id = db.Column(db.Integer, primary_key=True)
-    user1_id= db.Column(db.String(255), db.ForeignKey('users.user_id'), nullable=False)
-    user2_id = db.Column(db.String(255), db.ForeignKey('users.user_id'), nullable=False)
+    user1_id= db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    user2_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
 
     # Define relationships back to the 'users' table
     user1 = db.relationship('users', foreign_keys=[user1_id], back_populates='following')
@@ -255,6 +296,24 @@ class friendships(db.Model):
     __table_args__ = (
         UniqueConstraint('user1_id', 'user2_id', name='unique_user_follow'),
         CheckConstraint('user1_id != user2_id', name='check_user_follow'),
+        # followers of a user, for fan-out on write and follower counts
+        db.Index('friendships_user2_idx', 'user2_id'),
+    )
+
+# home_timeline table
+# Materialized following feed: a row per (follower, post) of the accounts they follow, written when the post is created.
+# author_id and date_posted are copies of the post's so paging and unfollowing never touch the post table.
+class HomeTimeline(db.Model):
+    __tablename__ = 'home_timeline'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.post_id', ondelete='CASCADE'), primary_key=True)
+    author_id = db.Column(db.Integer, nullable=False)
+    date_posted = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('home_timeline_user_date_idx', 'user_id', date_posted.desc(), post_id.desc()),
+        db.Index('home_timeline_user_author_idx', 'user_id', 'author_id'),
     )
 
 comment_likes = db.Table(
@@ -0,0 +1,77 @@
+import os
+import time
+from collections import defaultdict
+from threading import Lock
+from sqlalchemy import bindparam, func, update
+from src.models import db
+
+# LIKE_COUNTER_BUFFER=on batches like counter updates instead of writing them on every click
+LIKE_COUNTER_BUFFER = os.getenv('LIKE_COUNTER_BUFFER', 'off') != 'off'
+# seconds between flushes of the buffered counter changes
+LIKE_FLUSH_SECONDS = float(os.getenv('LIKE_FLUSH_SECONDS', '2'))
+
+
+# Write-behind buffer for the likes counters of posts and comments.
+# A hot post liked thousands of times a minute would otherwise have every click queue on its row lock;
+# here clicks only add to an in-process delta and flush() writes the sum per row every few seconds.
+# Like rows themselves are still written right away, so who liked what is never behind.
+# Counts read through pending() stay exact within this process; other processes see them after the flush.
+class LikeCounterBuffer:
+
+    def __init__(self, enabled=LIKE_COUNTER_BUFFER, interval=LIKE_FLUSH_SECONDS):
+        self.enabled = enabled
+        self._interval = interval
+        self._lock = Lock()
+        self._deltas = defaultdict(int)
+
+    # table is the counter's table (post or comment), keyed by its primary key
+    def add(self, table, target_id, change):
+        with self._lock:
+            self._deltas[(table, int(target_id))] += change
+
+    # the change not yet written to the counter of one row
+    def pending(self, table, target_id):
+        if not self._deltas:
+            return 0
+        with self._lock:
+            return self._deltas.get((table, int(target_id)), 0)
+
+    # write every buffered change, one batched UPDATE per table, returns how many counters changed
+    def flush(self):
+        with self._lock:
+            deltas = {key: change for key, change in self._deltas.items() if change}
+            self._deltas.clear()
+        if not deltas:
+            return 0
+        by_table = defaultdict(list)
+        for (table, target_id), change in deltas.items():
+            by_table[table].append({'target_id': target_id, 'change': change})
+        try:
+            for table, changes in by_table.items():
+                id_column, = table.primary_key.columns
+                statement = update(table)\
+                    .where(id_column == bindparam('target_id'))\
+                    .values(likes=func.coalesce(table.c.likes, 0) + bindparam('change'))
+                db.session.execute(statement, changes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # put the changes back for the next flush
+            with self._lock:
+                for key, change in deltas.items():
+                    self._deltas[key] += change
+            raise
+        return len(deltas)
+
+    # flush every interval, app_context() gives the database session to use
+    def run(self, app_context, sleep=time.sleep):
+        while True:
+            sleep(self._interval)
+            try:
+                with app_context():
+                    self.flush()
+            except Exception as e:
+                print(f'Could not flush like counters: {e}')
+
+# Singleton to be used in other modules
+like_counter_buffer_singleton = LikeCounterBuffer()
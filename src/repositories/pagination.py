@@ -0,0 +1,37 @@
+from datetime import datetime
+from sqlalchemy import tuple_
+from src.models import Post
+
+# posts per feed page
+FEED_PAGE_SIZE = 20
+
+# A feed cursor points just past the last post of a page: '<date_posted ISO>_<post_id>'
+def encode_cursor(post):
+    return make_cursor(post.date_posted, post.post_id)
+
+# the same for any row paged by (date_posted, id)
+def make_cursor(date_posted, row_id):
+    return f'{date_posted.isoformat()}_{row_id}'
+
+# raises ValueError for anything encode_cursor could not have produced
+def decode_cursor(cursor):
+    date_posted, _, post_id = cursor.rpartition('_')
+    return datetime.fromisoformat(date_posted), int(post_id)
+
+# up to limit + 1 (post, creator) rows after the cursor, newest first.
+# Keyset pagination on (date_posted, post_id), the post_id breaks ties between posts of the same instant;
+# the columns can come from another table carrying copies of both (e.g. a timeline) so its index is used.
+def keyset_rows(query, cursor, limit, date_column=Post.date_posted, id_column=Post.post_id):
+    if cursor is not None:
+        date_posted, post_id = decode_cursor(cursor)
+        query = query.filter(tuple_(date_column, id_column) < tuple_(date_posted, post_id))
+    return query.order_by(date_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+# split limit + 1 rows into (page, cursor of the next page or None)
+def split_page(rows, limit):
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1][0])
+    return rows, None
+
+def keyset_page(query, cursor, limit):
+    return split_page(keyset_rows(query, cursor, limit), limit)
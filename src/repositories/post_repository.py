@@ -1,4 +1,26 @@
-from src.models import Comment, Post, db, users
+from sqlalchemy import Integer, delete, exists, func, literal, null, select, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from src.models import Comment, Post, comment_likes, db, friendships, likes, users
+from src.repositories.like_counter_buffer import like_counter_buffer_singleton
+from src.repositories.pagination import FEED_PAGE_SIZE, decode_cursor, keyset_page, make_cursor
+from src.repositories.timeline_repository import timeline_repository_singleton
+from src.sanitize import HEADLINE_START, HEADLINE_STOP, highlight, sanitize_html
+
+# top-level comments per page of a thread
+COMMENT_PAGE_SIZE = 50
+
+# search results per page, and how deep into the ranking a search can page
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE = 50
+# ts_headline options: a couple of short fragments of the body, the whole title
+SNIPPET_OPTIONS = f'StartSel={HEADLINE_START}, StopSel={HEADLINE_STOP}, MaxFragments=2, MaxWords=30, MinWords=10, FragmentDelimiter=" … "'
+TITLE_OPTIONS = f'StartSel={HEADLINE_START}, StopSel={HEADLINE_STOP}, HighlightAll=true'
+
+# every comment of a thread from get_comment_thread, parents before their replies
+def walk_thread(nodes):
+    for node in nodes:
+        yield node['comment']
+        yield from walk_thread(node['replies'])
 
 class PostRepository:
 
@@ -10,60 +32,113 @@ class PostRepository:
     def get_all_posts_with_users(self):
         #filter by date
         return db.session.query(Post, users).join(users, users.user_id == Post.user_id).order_by(Post.date_posted.desc()).all()
+
+    # get one page of all posts with their creators, newest first
+    # cursor is None for the first page, returns ([(post, creator)], cursor of the next page or None)
+    def get_posts_page(self, cursor=None, limit=FEED_PAGE_SIZE):
+        query = db.session.query(Post, users).join(users, users.user_id == Post.user_id)
+        return keyset_page(query, cursor, limit)
     
-    # get all posts of users that are followed by the logged in user
-    def get_all_posts_of_followed_users(self, user_id):
-        user = users.query.get(user_id)
-        if user:
-            followed = user.get_all_following()
-            followed_user_posts = []
-            for username in followed:
-                posts = (
-                    db.session.query(Post, users)
-                    .join(users, users.user_id == Post.user_id)
-                    .filter(users.username == username)
-                    .order_by(Post.date_posted.desc())
-                    .all()
-                )
-                followed_user_posts += posts
-            return followed_user_posts
-        return []
+    # get one page of posts of users that are followed by the logged in user, newest first,
+    # from their home timeline, or in a single join query however many users they follow.
+    # cursor is None for the first page, returns ([(post, creator)], cursor of the next page or None)
+    def get_all_posts_of_followed_users(self, user_id, cursor=None, limit=FEED_PAGE_SIZE):
+        if timeline_repository_singleton.enabled:
+            page = timeline_repository_singleton.get_feed(user_id, cursor, limit)
+            if page is not None:
+                return page
+        query = db.session.query(Post, users)\
+            .join(friendships, friendships.user2_id == Post.user_id)\
+            .join(users, users.user_id == Post.user_id)\
+            .filter(friendships.user1_id == user_id)
+        return keyset_page(query, cursor, limit)
+
 
+    # like count, comment count and whether the viewer liked it, for every post of a page in one query
+    # returns {post_id: {'likes', 'comments', 'liked'}}
+    def get_post_stats(self, post_ids, viewer_id=None):
+        if not post_ids:
+            return {}
+        comment_counts = db.session.query(Comment.post_id, func.count().label('comments'))\
+            .filter(Comment.post_id.in_(post_ids))\
+            .group_by(Comment.post_id).subquery()
+        liked = select(likes.c.post_id).where(likes.c.user_id == viewer_id, likes.c.post_id.in_(post_ids))
+        rows = db.session.query(Post.post_id, Post.likes, func.coalesce(comment_counts.c.comments, 0), Post.post_id.in_(liked))\
+            .outerjoin(comment_counts, comment_counts.c.post_id == Post.post_id)\
+            .filter(Post.post_id.in_(post_ids)).all()
+        return {post_id: {'likes': (post_likes or 0) + like_counter_buffer_singleton.pending(Post.__table__, post_id),
+                          'comments': comments, 'liked': bool(is_liked)}
+                for post_id, post_likes, comments, is_liked in rows}
 
     # create a new post in the DB
     def create_post(self, title, content, user_id):
         new_post = Post(user_id, title, content)
+        new_post.content_html = sanitize_html(content)
         db.session.add(new_post)
         db.session.commit()
+        timeline_repository_singleton.fan_out(new_post)
         return new_post
     
-    # add a like to a post
+    # like a post, or take the like back if the user already liked it
+    # returns {'liked', 'likes'} after the toggle, None if the post does not exist
     def add_like(self, post_id, user_id):
-        post = Post.query.get(post_id)
-        user = users.query.get(user_id)
-        if post and user:
-            if user in post.liked_by:
-                post.liked_by.remove(user)
-                post.likes -= 1
-                db.session.commit()
-            elif user not in post.liked_by:
-                post.liked_by.append(user)
-                post.likes += 1
-                db.session.commit()
+        return self._toggle_like(likes.c.post_id, Post.post_id, Post.likes, post_id, user_id)
 
-    # add a like to a comment
+    # like a comment, or take the like back if the user already liked it
+    # returns {'liked', 'likes'} after the toggle, None if the comment does not exist
     def add_like_to_comment(self, comment_id, user_id):
-        comment = Comment.query.get(comment_id)
-        user = users.query.get(user_id)
-        if comment and user:
-            if user in comment.liked_by:
-                comment.liked_by.remove(user)
-                comment.likes -= 1
-                db.session.commit()
-            elif user not in comment.liked_by:
-                comment.liked_by.append(user)
-                comment.likes += 1
-                db.session.commit()
+        return self._toggle_like(comment_likes.c.comment_id, Comment.comment_id, Comment.likes, comment_id, user_id)
+
+    # A toggle is a DELETE of the like row, or an INSERT when there was none, and the counter moved in the same
+    # transaction by an UPDATE in the database: constant work however many likes there are, and two clicks
+    # racing each other cannot both count (only one of them deletes or inserts the row).
+    def _toggle_like(self, liked_column, id_column, counter, target_id, user_id):
+        # bound as INTEGER literals below, a non-numeric id raises ValueError here
+        target_id, user_id = int(target_id), int(user_id)
+        table = liked_column.table
+        removed = db.session.execute(
+            delete(table)
+            .where(table.c.user_id == user_id, liked_column == target_id)
+            .returning(liked_column)).first()
+        if removed is not None:
+            liked, change = False, -1
+        else:
+            # the EXISTS guards leave the insert empty when the user or the target does not exist
+            target_and_user = select(literal(user_id, Integer), literal(target_id, Integer))\
+                .where(exists().where(users.user_id == user_id), exists().where(id_column == target_id))
+            added = db.session.execute(
+                insert(table)
+                .from_select(['user_id', liked_column.name], target_and_user)
+                .on_conflict_do_nothing()
+                .returning(liked_column)).first()
+            if added is None:
+                db.session.rollback()
+                return self._like_state(liked_column, id_column, counter, target_id, user_id)
+            liked, change = True, 1
+        if like_counter_buffer_singleton.enabled:
+            # the counter is written by the buffer's next flush
+            db.session.commit()
+            like_counter_buffer_singleton.add(counter.table, target_id, change)
+            return self._like_state(liked_column, id_column, counter, target_id, user_id, liked)
+        count = db.session.execute(
+            update(counter.table)
+            .where(id_column == target_id)
+            .values({counter.name: func.coalesce(counter, 0) + change})
+            .returning(counter)).scalar()
+        db.session.commit()
+        return {'liked': liked, 'likes': count}
+
+    # the like state without changing it: the target is missing, a concurrent click inserted the row first,
+    # or the counter change is still buffered. liked is looked up unless given.
+    def _like_state(self, liked_column, id_column, counter, target_id, user_id, liked=None):
+        count = db.session.execute(select(counter).where(id_column == target_id)).first()
+        if count is None:
+            return None
+        if liked is None:
+            table = liked_column.table
+            liked = db.session.execute(
+                select(liked_column).where(table.c.user_id == user_id, liked_column == target_id)).first() is not None
+        return {'liked': liked, 'likes': (count[0] or 0) + like_counter_buffer_singleton.pending(counter.table, target_id)}
     
     # get the user who created the post
     def get_post_creator_id(self, post_id):
@@ -71,9 +146,66 @@ class PostRepository:
         if post:
             return post.user_id
 
+    # which of the given posts and comments the viewer liked, in one query over just those ids
+    # returns (set of post ids, set of comment ids)
+    def get_liked_ids(self, viewer_id, post_ids=(), comment_ids=()):
+        queries = []
+        if post_ids:
+            queries.append(select(literal('post').label('kind'), likes.c.post_id.label('liked_id'))
+                           .where(likes.c.user_id == viewer_id, likes.c.post_id.in_(post_ids)))
+        if comment_ids:
+            queries.append(select(literal('comment').label('kind'), comment_likes.c.comment_id.label('liked_id'))
+                           .where(comment_likes.c.user_id == viewer_id, comment_likes.c.comment_id.in_(comment_ids)))
+        if not queries:
+            return set(), set()
+        rows = db.session.execute(union_all(*queries) if len(queries) > 1 else queries[0]).all()
+        return {liked_id for kind, liked_id in rows if kind == 'post'}, {liked_id for kind, liked_id in rows if kind == 'comment'}
+
+    # one page of a post's comment thread, oldest top-level comment first, with all of their replies.
+    # The page of top-level comments and every reply under them, at any depth, come from one recursive query,
+    # the tree is put together in one pass over its rows.
+    # cursor is None for the first page, returns ([{'comment', 'creator', 'likes', 'replies'}], cursor of the next page or None)
+    def get_comment_thread(self, post_id, cursor=None, limit=COMMENT_PAGE_SIZE):
+        roots = select(Comment.comment_id, func.row_number().over(order_by=(Comment.date_posted, Comment.comment_id)).label('root_rank'))\
+            .where(Comment.post_id == post_id, Comment.parent_comment_id.is_(None))
+        if cursor is not None:
+            date_posted, comment_id = decode_cursor(cursor)
+            roots = roots.where(tuple_(Comment.date_posted, Comment.comment_id) > tuple_(date_posted, comment_id))
+        # one root more than the page tells whether there is a next page, its replies are not followed
+        roots = roots.order_by(Comment.date_posted, Comment.comment_id).limit(limit + 1).cte('roots')
+        thread = select(roots.c.comment_id, roots.c.root_rank).cte('thread', recursive=True)
+        parent = thread.alias()
+        thread = thread.union_all(
+            select(Comment.comment_id, parent.c.root_rank)
+            .join(parent, Comment.parent_comment_id == parent.c.comment_id)
+            .where(parent.c.root_rank <= limit))
+        rows = db.session.query(Comment, users)\
+            .join(thread, thread.c.comment_id == Comment.comment_id)\
+            .join(users, users.user_id == Comment.user_id)\
+            .order_by(Comment.date_posted, Comment.comment_id).all()
+
+        nodes = {comment.comment_id: {
+            'comment': comment,
+            'creator': creator,
+            'likes': (comment.likes or 0) + like_counter_buffer_singleton.pending(Comment.__table__, comment.comment_id),
+            'replies': [],
+        } for comment, creator in rows}
+        top_level = []
+        for comment, _ in rows:
+            node = nodes[comment.comment_id]
+            if comment.parent_comment_id in nodes:
+                nodes[comment.parent_comment_id]['replies'].append(node)
+            elif comment.parent_comment_id is None:
+                top_level.append(node)
+        if len(top_level) > limit:
+            last = top_level[limit - 1]['comment']
+            return top_level[:limit], make_cursor(last.date_posted, last.comment_id)
+        return top_level, None
+
     # add a comment to a post
     def add_comment(self, user_id, post_id, content, parent_comment_id=None):
         new_comment = Comment(user_id, post_id, content, parent_comment_id)
+        new_comment.content_html = sanitize_html(content)
         db.session.add(new_comment)
         db.session.commit()
         return new_comment
@@ -97,6 +229,7 @@ class PostRepository:
         if post:
             post.title = title
             post.content = content
+            post.content_html = sanitize_html(content)
             if post.file_upload:
                 post.file_upload = None
             if file_upload:
@@ -105,5 +238,75 @@ class PostRepository:
             return True
         return False
 
+    # full-text search over post titles and bodies and comments, best match first.
+    # Matching and ranking use the search_vector GIN indexes; the snippets, the costly part, are only made
+    # for the rows of the requested page.
+    # returns ([{'kind', 'post_id', 'comment_id', 'title', 'snippet', 'username', 'date_posted'}], whether there is a next page)
+    def search(self, text, page=1, limit=SEARCH_PAGE_SIZE):
+        query = func.websearch_to_tsquery('english', text)
+        posts = select(
+            literal('post').label('kind'),
+            Post.post_id.label('post_id'),
+            null().cast(Integer).label('comment_id'),
+            func.ts_rank(Post.search_vector, query).label('rank'),
+            Post.date_posted.label('date_posted'),
+        ).where(Post.search_vector.op('@@')(query))
+        comments = select(
+            literal('comment'),
+            Comment.post_id,
+            Comment.comment_id,
+            func.ts_rank(Comment.search_vector, query),
+            Comment.date_posted,
+        ).where(Comment.search_vector.op('@@')(query))
+        matches = union_all(posts, comments).subquery('matches')
+        matches = select(matches)\
+            .order_by(matches.c.rank.desc(), matches.c.date_posted.desc(), matches.c.post_id.desc(), matches.c.comment_id.desc())\
+            .offset((page - 1) * limit).limit(limit + 1).subquery('page')
+
+        rows = db.session.execute(
+            select(
+                matches.c.kind,
+                matches.c.post_id,
+                matches.c.comment_id,
+                func.ts_headline('english', Post.title, query, TITLE_OPTIONS),
+                func.ts_headline('english', func.coalesce(Comment.content, Post.content, ''), query, SNIPPET_OPTIONS),
+                users.username,
+                matches.c.date_posted,
+            )
+            .join(Post, Post.post_id == matches.c.post_id)
+            .outerjoin(Comment, Comment.comment_id == matches.c.comment_id)
+            .join(users, users.user_id == func.coalesce(Comment.user_id, Post.user_id))
+            .order_by(matches.c.rank.desc(), matches.c.date_posted.desc(), matches.c.post_id.desc(), matches.c.comment_id.desc())
+        ).all()
+        results = [{
+            'kind': kind,
+            'post_id': post_id,
+            'comment_id': comment_id,
+            'title': highlight(title),
+            'snippet': highlight(snippet, html=True),
+            'username': username,
+            'date_posted': date_posted,
+        } for kind, post_id, comment_id, title, snippet, username, date_posted in rows[:limit]]
+        return results, len(rows) > limit
+
+    # sanitize the posts and comments written before content_html existed, batch_size rows per transaction
+    # returns how many rows were filled
+    def backfill_content_html(self, batch_size=500):
+        filled = 0
+        for model, id_column in ((Post, Post.post_id), (Comment, Comment.comment_id)):
+            last_id = 0
+            while True:
+                rows = model.query\
+                    .filter(model.content_html.is_(None), id_column > last_id)\
+                    .order_by(id_column).limit(batch_size).all()
+                if not rows:
+                    break
+                for row in rows:
+                    row.content_html = sanitize_html(row.content)
+                db.session.commit()
+                filled += len(rows)
+                last_id = getattr(rows[-1], id_column.key)
+        return filled
+
 # Singleton to be used in other modules
 post_repository_singleton = PostRepository()
@@ -0,0 +1,164 @@
+import os
+import random
+import time
+from threading import Lock
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from src.models import HomeTimeline, Post, db, friendships, users
+from src.repositories.pagination import FEED_PAGE_SIZE, keyset_rows, split_page
+
+# HOME_TIMELINES=off reads the following feed with the fan-in join query instead
+HOME_TIMELINES = os.getenv('HOME_TIMELINES', 'on') != 'off'
+# newest posts kept per timeline, older pages are read with the fan-in query
+TIMELINE_CAPACITY = int(os.getenv('TIMELINE_CAPACITY', '800'))
+# authors with at least this many followers are not fanned out, their posts are merged in at read time
+CELEBRITY_FOLLOWERS = int(os.getenv('CELEBRITY_FOLLOWERS', '10000'))
+# how long (seconds) the set of celebrity authors is trusted before it is counted again
+CELEBRITY_TTL = 300
+# share of new posts whose fan-out also trims the followers' timelines back to capacity
+TIMELINE_TRIM_RATE = float(os.getenv('TIMELINE_TRIM_RATE', '0.05'))
+
+
+# Fan-out on write home timelines.
+# Creating a post copies its id into the timeline of every follower, so reading the following feed
+# is one range scan of home_timeline_user_date_idx. Posts of celebrity authors are not copied
+# (one post would mean thousands of writes), followers read them with a small merge instead.
+# Reads never write: timelines are trimmed by a sample of fan-outs, so they run a little over capacity
+# in between, and a page the timeline cannot fill is left to the fan-in query.
+class TimelineRepository:
+
+    def __init__(self, enabled=HOME_TIMELINES, capacity=TIMELINE_CAPACITY, celebrity_followers=CELEBRITY_FOLLOWERS,
+                 celebrity_ttl=CELEBRITY_TTL, trim_rate=TIMELINE_TRIM_RATE, clock=time.monotonic, random=random.random):
+        self.enabled = enabled
+        self._capacity = capacity
+        self._trim_rate = trim_rate
+        self._random = random
+        self._celebrity_followers = celebrity_followers
+        self._celebrity_ttl = celebrity_ttl
+        self._clock = clock
+        self._lock = Lock()
+        self._celebrities = frozenset()
+        self._celebrities_loaded = None
+
+    # user ids with at least celebrity_followers followers
+    def celebrities(self):
+        with self._lock:
+            now = self._clock()
+            if self._celebrities_loaded is not None and now - self._celebrities_loaded < self._celebrity_ttl:
+                return self._celebrities
+        rows = db.session.query(friendships.user2_id)\
+            .group_by(friendships.user2_id)\
+            .having(func.count() >= self._celebrity_followers).all()
+        celebrities = frozenset(user_id for user_id, in rows)
+        with self._lock:
+            self._celebrities = celebrities
+            self._celebrities_loaded = now
+        return celebrities
+
+    # copy a new post into its author's followers' timelines
+    def fan_out(self, post):
+        if not self.enabled or post.user_id in self.celebrities():
+            return
+        followers = select(friendships.user1_id, Post.post_id, Post.user_id, Post.date_posted)\
+            .join(friendships, friendships.user2_id == Post.user_id)\
+            .where(Post.post_id == post.post_id)
+        self._insert(followers)
+        if self._random() < self._trim_rate:
+            self._trim_followers(post.user_id)
+        db.session.commit()
+
+    # a new follow: copy the followed user's latest posts into the follower's timeline
+    def backfill(self, user_id, followed_id):
+        if not self.enabled or followed_id in self.celebrities():
+            return
+        latest = select(literal(user_id), Post.post_id, Post.user_id, Post.date_posted)\
+            .where(Post.user_id == followed_id)\
+            .order_by(Post.date_posted.desc(), Post.post_id.desc())\
+            .limit(self._capacity)
+        self._insert(latest)
+        self._trim(user_id)
+        db.session.commit()
+
+    # an unfollow: take the followed user's posts out of the follower's timeline
+    def remove_followed(self, user_id, followed_id):
+        if not self.enabled:
+            return
+        HomeTimeline.query.filter_by(user_id=user_id, author_id=followed_id).delete(synchronize_session=False)
+        db.session.commit()
+
+    # fill a timeline from the posts of everyone the user follows, for users that existed
+    # before home timelines (flask rebuild-home-timelines), until then they read with the fan-in query
+    def rebuild(self, user_id):
+        latest = select(friendships.user1_id, Post.post_id, Post.user_id, Post.date_posted)\
+            .join(friendships, friendships.user2_id == Post.user_id)\
+            .where(friendships.user1_id == user_id)
+        celebrities = self.celebrities()
+        if celebrities:
+            latest = latest.where(Post.user_id.notin_(celebrities))
+        latest = latest.order_by(Post.date_posted.desc(), Post.post_id.desc()).limit(self._capacity)
+        self._insert(latest)
+        db.session.commit()
+
+    # rebuild the timeline of everyone who follows someone, returns how many were rebuilt
+    def rebuild_all(self):
+        followers = [user_id for user_id, in db.session.query(friendships.user1_id).distinct().all()]
+        for user_id in followers:
+            self.rebuild(user_id)
+        return len(followers)
+
+    # one page of the following feed, the same ([(post, creator)], next cursor) as the fan-in query,
+    # or None when the timeline runs out before the page is full: older posts may have been trimmed
+    # from it, or it was never built, so only the fan-in query knows the rest of the feed
+    def get_feed(self, user_id, cursor=None, limit=FEED_PAGE_SIZE):
+        query = db.session.query(Post, users)\
+            .join(HomeTimeline, HomeTimeline.post_id == Post.post_id)\
+            .join(users, users.user_id == Post.user_id)\
+            .filter(HomeTimeline.user_id == user_id)
+        rows = keyset_rows(query, cursor, limit, HomeTimeline.date_posted, HomeTimeline.post_id)
+        if len(rows) <= limit:
+            return None
+
+        celebrities = self.celebrities()
+        if celebrities:
+            query = db.session.query(Post, users)\
+                .join(friendships, friendships.user2_id == Post.user_id)\
+                .join(users, users.user_id == Post.user_id)\
+                .filter(friendships.user1_id == user_id, Post.user_id.in_(celebrities))
+            # a post fanned out before its author became a celebrity is in both
+            merged = {post.post_id: (post, creator) for post, creator in rows + keyset_rows(query, cursor, limit)}
+            rows = sorted(merged.values(), key=lambda row: (row[0].date_posted, row[0].post_id), reverse=True)
+        return split_page(rows, limit)
+
+    def _insert(self, rows):
+        statement = insert(HomeTimeline)\
+            .from_select(['user_id', 'post_id', 'author_id', 'date_posted'], rows)\
+            .on_conflict_do_nothing()
+        db.session.execute(statement)
+
+    # delete everything older than the capacity-th newest post
+    def _trim(self, user_id):
+        oldest_kept = db.session.query(HomeTimeline.date_posted, HomeTimeline.post_id)\
+            .filter(HomeTimeline.user_id == user_id)\
+            .order_by(HomeTimeline.date_posted.desc(), HomeTimeline.post_id.desc())\
+            .offset(self._capacity - 1).limit(1).first()
+        if oldest_kept is not None:
+            HomeTimeline.query.filter(
+                HomeTimeline.user_id == user_id,
+                tuple_(HomeTimeline.date_posted, HomeTimeline.post_id) < tuple_(*oldest_kept),
+            ).delete(synchronize_session=False)
+
+    # trim the timelines of everyone following author_id in one statement
+    def _trim_followers(self, author_id):
+        rank = func.row_number().over(
+            partition_by=HomeTimeline.user_id,
+            order_by=(HomeTimeline.date_posted.desc(), HomeTimeline.post_id.desc()))
+        ranked = select(HomeTimeline.user_id, HomeTimeline.post_id, rank.label('rank'))\
+            .join(friendships, friendships.user1_id == HomeTimeline.user_id)\
+            .where(friendships.user2_id == author_id)\
+            .subquery()
+        too_old = select(ranked.c.user_id, ranked.c.post_id).where(ranked.c.rank > self._capacity)
+        db.session.execute(
+            delete(HomeTimeline).where(tuple_(HomeTimeline.user_id, HomeTimeline.post_id).in_(too_old)))
+
+# Singleton to be used in other modules
+timeline_repository_singleton = TimelineRepository()
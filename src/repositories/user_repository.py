@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta
+from src.repositories.timeline_repository import timeline_repository_singleton
 from src.models import Post, db, friendships, users, live_posts, likes, comment_likes, Comment, Watchlist
 from flask import abort, flash, session
-from sqlalchemy import or_
+from sqlalchemy import desc, func, or_
 
 class UserRepository:
     # check if a password meets all requirements
@@ -106,6 +107,21 @@ class UserRepository:
             return watchlist
         return None
     
+    # tickers ordered by how many watchlists they are on, most watched first
+    def get_most_watched(self, limit):
+        watchers = func.count(Watchlist.user_id).label('watchers')
+        rows = db.session.query(Watchlist.ticker_symbol, watchers)\
+            .group_by(Watchlist.ticker_symbol)\
+            .order_by(desc(watchers), Watchlist.ticker_symbol)\
+            .limit(limit).all()
+        return [row.ticker_symbol for row in rows]
+
+    # {ticker: number of watchlists it is on}
+    def get_watch_counts(self):
+        rows = db.session.query(Watchlist.ticker_symbol, func.count(Watchlist.user_id))\
+            .group_by(Watchlist.ticker_symbol).all()
+        return {ticker_symbol: count for ticker_symbol, count in rows}
+
     def add_to_watchlist(self, user_id, ticker_symbol):
         user = users.query.get(user_id)
         if user:
@@ -125,10 +141,12 @@ class UserRepository:
         if friendship:
             db.session.delete(friendship)
             db.session.commit()
+            timeline_repository_singleton.remove_followed(user_id, user_to_follow_id)
         else:
             friendship = friendships(user_id,user_to_follow_id)
             db.session.add(friendship)
             db.session.commit()
+            timeline_repository_singleton.backfill(user_id, user_to_follow_id)
 
 # Singleton to be used in other modules
 user_repository_singleton = UserRepository()
\ No newline at end of file
@@ -0,0 +1,24 @@
+import bleach
+from markupsafe import Markup, escape
+
+# Tags and attributes kept in post and comment bodies, everything else is escaped
+ALLOWED_TAGS = ['p', 'div', 'em', 'strong', 'del', 'a', 'img', 'h1', 'h2',
+                'h3', 'h4', 'h5', 'h6', 'blockquote', 'ul', 'ol', 'li', 'hr', 'br', 'pre']
+ALLOWED_ATTRIBUTES = {'*': ['class', 'style'], 'a': ['href', 'target']}
+
+# Function to sanitize HTML content
+# bleach parses the whole document, so posts and comments are sanitized once when they are written
+# and the result is stored in content_html
+def sanitize_html(content):
+    return bleach.clean(content or '', tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+# ts_headline marks matches with these private use characters, which never occur in posts,
+# so the snippet can be escaped first and the marks turned into <mark> afterwards
+HEADLINE_START = '\ue000'
+HEADLINE_STOP = '\ue001'
+
+# a search snippet safe to render: html snippets (post and comment bodies) lose their tags,
+# plain ones (titles) are escaped
+def highlight(headline, html=False):
+    safe = bleach.clean(headline or '', tags=[], strip=True) if html else str(escape(headline or ''))
+    return Markup(safe.replace(HEADLINE_START, '<mark>').replace(HEADLINE_STOP, '</mark>'))
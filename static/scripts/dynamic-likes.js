@@ -1,17 +1,22 @@
-
 // Like Button Ajax
+// Handlers are delegated from the document so posts added later (infinite scroll) work too
 $(document).ready(function () {
-    $('.like-button').click(function (event) {
+    $(document).on('click', '.like-button', function (event) {
         event.stopPropagation();
         var postId = $(this).data('post-id');
         var userId = $(this).data('user-id');
+        if (postId === undefined) {
+            return;
+        }
+        var button = $(this);
+        toggleLike(button, '.like-count');
 
         $.ajax({
             type: 'POST',
             url: '/posts/like',
             data: { post_id: postId, user_id: userId },
             success: function (data) {
-                console.log('Like added successfully');
+                setLike(button, '.like-count', data);
             },
             error: function (error) {
                 console.error('Error adding like:', error);
@@ -19,17 +24,22 @@ $(document).ready(function () {
         });
     });
 
-    $('.like-comment').click(function (event) {
+    $(document).on('click', '.like-comment', function (event) {
         event.stopPropagation();
         var commentId = $(this).data('comment-id');
         var userId = $(this).data('user-id');
+        if (commentId === undefined) {
+            return;
+        }
+        var button = $(this);
+        toggleLike(button, '.like-comment-count');
 
         $.ajax({
             type: 'POST',
             url: '/posts/like_comment',
             data: { comment_id: commentId, user_id: userId },
             success: function (data) {
-                console.log('Comment added successfully');
+                setLike(button, '.like-comment-count', data);
             },
             error: function (error) {
                 console.error('Error adding Comment:', error);
@@ -39,39 +49,28 @@ $(document).ready(function () {
 });
 
 // Like Button Dynamic UI
-function liked_or_not() {
-    const like_button = document.getElementsByClassName("like-button");
-    const like_count = document.getElementsByClassName("like-count");
-    for (let i = 0; i < like_button.length; i++) {
-        like_button[i].addEventListener("click", function () {
-            if (like_button[i].classList.contains("liked")) {
-                like_count[i].innerHTML = parseInt(like_count[i].innerHTML) - 1;
-            } else {
-                like_count[i].innerHTML = parseInt(like_count[i].innerHTML) + 1;
-            }
-            like_button[i].firstChild.classList.toggle("fa-regular");
-            like_button[i].firstChild.classList.toggle("fa-solid");
-            like_button[i].classList.toggle("liked");
-        });
+// the count is the closest one next to the button
+function likeCount(button, countSelector) {
+    return button.closest(':has(' + countSelector + ')').find(countSelector).first();
+}
+
+// flip the button and count right away, the server's answer corrects them
+function toggleLike(button, countSelector) {
+    var count = likeCount(button, countSelector);
+    if (button.hasClass('liked')) {
+        count.text(parseInt(count.text()) - 1);
+    } else {
+        count.text(parseInt(count.text()) + 1);
     }
+    button.children().first().toggleClass('fa-regular fa-solid');
+    button.toggleClass('liked');
 }
-liked_or_not();
 
-function liked_comment_or_not() {
-    const like_button = document.getElementsByClassName("like-comment");
-    const like_count = document.getElementsByClassName("like-comment-count");
-    console.log(like_button.length);
-    for (let i = 0; i < like_button.length; i++) {
-        like_button[i].addEventListener("click", function () {
-            if (like_button[i].classList.contains("liked")) {
-                like_count[i].innerHTML = parseInt(like_count[i].innerHTML) - 1;
-            } else {
-                like_count[i].innerHTML = parseInt(like_count[i].innerHTML) + 1;
-            }
-            like_button[i].firstChild.classList.toggle("fa-regular");
-            like_button[i].firstChild.classList.toggle("fa-solid");
-            like_button[i].classList.toggle("liked");
-        });
+// data is {liked, likes} after the toggle, as stored
+function setLike(button, countSelector, data) {
+    likeCount(button, countSelector).text(data.likes);
+    if (button.hasClass('liked') !== data.liked) {
+        button.children().first().toggleClass('fa-regular fa-solid');
+        button.toggleClass('liked');
     }
 }
-liked_comment_or_not();
\ No newline at end of file
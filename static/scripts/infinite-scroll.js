@@ -0,0 +1,45 @@
+// Infinite scroll for the post feeds
+// A .feed-more block (data-feed, data-cursor) sits under each feed; when it scrolls into view the
+// next page is fetched from /posts/feed and inserted above it. Its "Older posts" link still works without JS.
+$(document).ready(function () {
+    const loading = new Set();
+
+    function loadMore(more) {
+        if (loading.has(more)) {
+            return;
+        }
+        loading.add(more);
+        const params = new URLSearchParams({ feed: more.dataset.feed, cursor: more.dataset.cursor });
+        fetch(`/posts/feed?${params}`)
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then((data) => {
+                more.insertAdjacentHTML('beforebegin', data.html);
+                if (data.next_cursor) {
+                    more.dataset.cursor = data.next_cursor;
+                    // observing again fires right away if the block is still in view
+                    observer.unobserve(more);
+                    observer.observe(more);
+                } else {
+                    observer.unobserve(more);
+                    more.remove();
+                }
+            })
+            .catch((error) => console.error('Error loading posts:', error))
+            .finally(() => loading.delete(more));
+    }
+
+    const observer = new IntersectionObserver((entries) => {
+        for (const entry of entries) {
+            if (entry.isIntersecting) {
+                loadMore(entry.target);
+            }
+        }
+    }, { rootMargin: '600px' });
+
+    document.querySelectorAll('.feed-more').forEach((more) => observer.observe(more));
+});
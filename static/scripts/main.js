@@ -15,39 +15,100 @@ chart.applyOptions({
     }
 });
 
-fetch('/data')
-    .then(response => response.json())
-    .then(data => {
-
-        const formattedData = data.map(item => ({
-            time: ((new Date(item.date).getTime() / 1000) - (5 * 60 * 60)), // Convert UTC to EST (Standard Time)
-            open: item.open,
-            high: item.high,
-            low: item.low,
-            close: item.close,
-            volume: item.volume
-        }));
-
-        candleSeries.setData(formattedData);
-        //console.log((new Date(item.date).getTime() / 1000))
-    })
-    .catch(error => console.error('Error fetching data:', error));
+// Offset applied to every bar time to convert UTC to EST (Standard Time)
+const EST_OFFSET = 5 * 60 * 60;
+
+// Decode the binary /data format: a uint32 bar count and a format version,
+// followed by six float64 columns (time in epoch seconds, open, high, low, close, volume)
+function decodeBars(buffer) {
+    const count = new DataView(buffer).getUint32(0, true);
+    const columns = new Float64Array(buffer, 8, 6 * count);
+    const bars = new Array(count);
+    for (let i = 0; i < count; i++) {
+        bars[i] = {
+            time: columns[i] - EST_OFFSET,
+            open: columns[count + i],
+            high: columns[2 * count + i],
+            low: columns[3 * count + i],
+            close: columns[4 * count + i],
+            volume: columns[5 * count + i]
+        };
+    }
+    return bars;
+}
+
+// Fetch the bars of a symbol (or the default symbol) and draw them on the chart
+function loadChart(symbol) {
+    const request = symbol === undefined
+        ? fetch('/data?format=binary')
+        : fetch('/data?format=binary', {
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            method: 'POST',
+            body: JSON.stringify({
+                Stock: symbol
+            })
+        });
+    return request
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Error: ${response.status}`);
+            }
+            return response.arrayBuffer();
+        })
+        .then(buffer => candleSeries.setData(decodeBars(buffer)))
+        .catch(error => console.error('Error fetching data:', error));
+}
+
+loadChart();
+
+// Symbol currently drawn on the chart, the server streams it through a per-symbol room
+var currentSymbol = 'SPY';
 
 var socket = io.connect();
-socket.on('updateSensorData', (new_value) => {
-    data = JSON.parse(new_value['value']);
 
-    const updatedData = {
-        time: ((new Date(data.date['0']).getTime() / 1000) - (5 * 60 * 60)),
-        open: data.open['0'],
-        high: data.high['0'],
-        low: data.low['0'],
-        close: data.close['0']
-    };
-    console.log(updatedData);
-    candleSeries.update(updatedData);
+// (re)join the room of the charted symbol, also runs again after a reconnect
+socket.on('connect', () => {
+    socket.emit('subscribe', { symbol: currentSymbol });
+});
 
+// Live bar of the charted symbol, ticks only carry the fields that changed
+var liveBar = null;
 
+// switch the live stream to another symbol
+function watchSymbol(symbol) {
+    if (symbol === currentSymbol) {
+        return;
+    }
+    socket.emit('unsubscribe', { symbol: currentSymbol });
+    currentSymbol = symbol;
+    liveBar = null;
+    socket.emit('subscribe', { symbol: currentSymbol });
+}
+
+socket.on('updateSensorData', (frame) => {
+    // ignore updates still in flight for a symbol we just switched away from
+    if (frame.symbol !== currentSymbol) {
+        return;
+    }
+    frame.ticks.forEach((tick) => {
+        if (liveBar === null || liveBar.t !== tick.t) {
+            liveBar = { t: tick.t };
+        }
+        Object.assign(liveBar, tick);
+        if (liveBar.o === undefined) {
+            // a partial tick for a bar we never saw in full, wait for the next full one
+            return;
+        }
+        candleSeries.update({
+            time: liveBar.t - EST_OFFSET,
+            open: liveBar.o,
+            high: liveBar.h,
+            low: liveBar.l,
+            close: liveBar.c
+        });
+    });
 });
 
 $('#sendBtn').on('click', function () {
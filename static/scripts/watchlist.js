@@ -112,57 +112,67 @@ const addTickerToGrid = (ticker) => {
         <button class="remove-btn" data-ticker="${ticker}">Remove</button></div>`)
 
 }
+// one request for the prices of every ticker in the watchlist
 const updatePrices = () => {
-    tickers.forEach((ticker) => {
-        $.ajax({
-            url: '/display_watchlist',
-            type: "POST",
-            data: JSON.stringify({
-                'ticker': ticker
-            }),
-            contentType: 'application/json; charset=utf-8',
-            dataType: 'json',
-            success: (data) => {
-                var changePercent = ((data.currentPrice - data.openPrice) / data.openPrice) * 100;
-                var colorclass;
-                if (changePercent <= -2) {
-                    colorclass = 'dark-red';
-                }
-                else if (changePercent < 0) {
-                    colorclass = 'red';
-                }
-                else if (changePercent == 0) {
-                    colorclass = 'gray';
-                }
-                else if (changePercent <= 2) {
-                    colorclass = 'green';
+    if (!tickers.length) {
+        return;
+    }
+    $.ajax({
+        url: '/quotes',
+        type: "POST",
+        data: JSON.stringify({
+            'symbols': tickers
+        }),
+        contentType: 'application/json; charset=utf-8',
+        dataType: 'json',
+        success: (data) => {
+            tickers.forEach((ticker) => {
+                if (data.quotes[ticker]) {
+                    showQuote(ticker, data.quotes[ticker]);
                 }
-                else {
-                    colorclass = 'dark-green';
-                }
-
-                $(`#${ticker}-price`).text(`$${data.currentPrice.toFixed(2)}`);
-                $(`#${ticker}-pct`).text(`${changePercent.toFixed(2)}%`);
-
-                $(`#${ticker}-price`).removeClass(`dark-red red gray green dark-green`).addClass(colorclass);
-                $(`#${ticker}-pct`).removeClass(`dark-red red gray green dark-green`).addClass(colorclass);
-
-                var flaskClass;
-                if (lastPrices[ticker] > data.currentPrice) {
-                    flaskClass = 'red-flask';
-                } else if (lastPrices[ticker] < data.currentPrice) {
-                    flaskClass = 'green-flask';
-                }
-                else {
-                    flaskClass = 'gray-flask'
-                }
-                lastPrices[ticker] = data.currentPrice;
-
-                $(`#${ticker}`).addClass(flaskClass);
-                setTimeout(() => {
-                    $(`#${ticker}`).removeClass(flaskClass);
-                }, 1000);
-            }
-        });
+            });
+        }
     });
+}
+
+const showQuote = (ticker, data) => {
+    var changePercent = ((data.currentPrice - data.openPrice) / data.openPrice) * 100;
+    var colorclass;
+    if (changePercent <= -2) {
+        colorclass = 'dark-red';
+    }
+    else if (changePercent < 0) {
+        colorclass = 'red';
+    }
+    else if (changePercent == 0) {
+        colorclass = 'gray';
+    }
+    else if (changePercent <= 2) {
+        colorclass = 'green';
+    }
+    else {
+        colorclass = 'dark-green';
+    }
+
+    $(`#${ticker}-price`).text(`$${data.currentPrice.toFixed(2)}`);
+    $(`#${ticker}-pct`).text(`${changePercent.toFixed(2)}%`);
+
+    $(`#${ticker}-price`).removeClass(`dark-red red gray green dark-green`).addClass(colorclass);
+    $(`#${ticker}-pct`).removeClass(`dark-red red gray green dark-green`).addClass(colorclass);
+
+    var flaskClass;
+    if (lastPrices[ticker] > data.currentPrice) {
+        flaskClass = 'red-flask';
+    } else if (lastPrices[ticker] < data.currentPrice) {
+        flaskClass = 'green-flask';
+    }
+    else {
+        flaskClass = 'gray-flask'
+    }
+    lastPrices[ticker] = data.currentPrice;
+
+    $(`#${ticker}`).addClass(flaskClass);
+    setTimeout(() => {
+        $(`#${ticker}`).removeClass(flaskClass);
+    }, 1000);
 }
\ No newline at end of file
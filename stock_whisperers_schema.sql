@@ -33,10 +33,16 @@ CREATE TABLE IF NOT EXISTS investments (
 CREATE TABLE IF NOT EXISTS watchlist (
     watchlist_id SERIAL PRIMARY KEY,
     user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
-    ticker_symbol VARCHAR(10) NOT NULL UNIQUE,
-    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ticker_symbol VARCHAR(10) NOT NULL,
+    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT watchlist_user_id_ticker_symbol_key UNIQUE (user_id, ticker_symbol)
 );
 
+-- watchlists created when a ticker could only be watched by one user
+ALTER TABLE watchlist DROP CONSTRAINT IF EXISTS watchlist_ticker_symbol_key;
+ALTER TABLE watchlist DROP CONSTRAINT IF EXISTS watchlist_user_id_ticker_symbol_key;
+ALTER TABLE watchlist ADD CONSTRAINT watchlist_user_id_ticker_symbol_key UNIQUE (user_id, ticker_symbol);
+
 CREATE TABLE IF NOT EXISTS live_posts (
     post_id SERIAL,
     content VARCHAR(255),
@@ -57,6 +63,10 @@ CREATE TABLE IF NOT EXISTS post (
     user_id INT REFERENCES users(user_id) ON DELETE CASCADE
 );
 
+-- feeds page through posts newest first by (date_posted, post_id)
+CREATE INDEX IF NOT EXISTS post_date_idx ON post (date_posted DESC, post_id DESC);
+CREATE INDEX IF NOT EXISTS post_user_date_idx ON post (user_id, date_posted DESC, post_id DESC);
+
 CREATE TABLE IF NOT EXISTS comment (
     comment_id SERIAL PRIMARY KEY,
     content TEXT,
@@ -68,6 +78,24 @@ CREATE TABLE IF NOT EXISTS comment (
     FOREIGN KEY (parent_comment_id) REFERENCES comment(comment_id) ON DELETE CASCADE
 );
 
+CREATE INDEX IF NOT EXISTS comment_post_idx ON comment (post_id, date_posted);
+
+-- sanitized post and comment bodies, stored when they are written;
+-- fill rows from before these columns with: flask backfill-content-html
+ALTER TABLE post ADD COLUMN IF NOT EXISTS content_html TEXT;
+ALTER TABLE comment ADD COLUMN IF NOT EXISTS content_html TEXT;
+
+-- full-text search, Postgres keeps the vectors up to date on every insert and update
+ALTER TABLE post ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'B')
+) STORED;
+ALTER TABLE comment ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    to_tsvector('english', coalesce(content, ''))
+) STORED;
+CREATE INDEX IF NOT EXISTS post_search_idx ON post USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS comment_search_idx ON comment USING GIN (search_vector);
+
 CREATE TABLE IF NOT EXISTS likes (
     post_id INT,
     user_id INT,
@@ -86,6 +114,20 @@ CREATE TABLE IF NOT EXISTS friendships (
     CONSTRAINT check_user_follow CHECK (user1_id != user2_id)
 );
 
+CREATE INDEX IF NOT EXISTS friendships_user2_idx ON friendships (user2_id);
+
+-- materialized following feeds, filled when posts are created
+CREATE TABLE IF NOT EXISTS home_timeline (
+    user_id INT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    post_id INT NOT NULL REFERENCES post(post_id) ON DELETE CASCADE,
+    author_id INT NOT NULL,
+    date_posted TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+);
+
+CREATE INDEX IF NOT EXISTS home_timeline_user_date_idx ON home_timeline (user_id, date_posted DESC, post_id DESC);
+CREATE INDEX IF NOT EXISTS home_timeline_user_author_idx ON home_timeline (user_id, author_id);
+
 CREATE TABLE IF NOT EXISTS comment_likes (
     comment_id INT,
     user_id INT,
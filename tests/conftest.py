@@ -0,0 +1,4 @@
+import os
+
+# Importing app must not start the background cache warmer during tests
+os.environ.setdefault('CACHE_WARMER', 'off')
@@ -1,10 +1,17 @@
 from flask import g, session
 from src.models import *
+from src.repositories.user_repository import user_repository_singleton
 
 def reset_db():
+    HomeTimeline.query.delete()
     users.query.delete()
     friendships.query.delete()
     live_posts.query.delete()
     Comment.query.delete()
     Post.query.delete() 
     db.session.commit()
+
+# add a test user, needs an app context
+def make_user(username):
+    user_repository_singleton.add_user(first_name='Test', last_name='User', username=username, email=f'{username}@test.com', password='Test123', profile_picture='default-profile-pic.jpg')
+    return user_repository_singleton.get_user_by_username(username)
@@ -0,0 +1,37 @@
+from datetime import datetime
+from src.market_data.aggregator import EXCHANGE_TZ, BarAggregator, session_start
+
+
+def ts(hour, minute, second=0, day=18):
+    return int(datetime(2023, 12, day, hour, minute, second, tzinfo=EXCHANGE_TZ).timestamp())
+
+
+def test_quotes_roll_over_at_minute_boundary():
+    aggregator = BarAggregator(timeframes=('1m', '1h'))
+    aggregator.add_quote('SPY', ts(9, 30, 5), 100.0, 10)
+    aggregator.add_quote('SPY', ts(9, 30, 40), 101.0, 5)
+    aggregator.add_quote('SPY', ts(9, 30, 50), 99.5, 5)
+
+    assert aggregator.current('SPY', '1m') == {'t': ts(9, 30), 'open': 100.0, 'high': 101.0, 'low': 99.5, 'close': 99.5, 'volume': 20}
+
+    aggregator.add_quote('SPY', ts(9, 31, 1), 99.0, 1)
+    assert aggregator.current('SPY', '1m')['open'] == 99.0
+    assert aggregator.current('SPY', '1h') == {'t': ts(9, 0), 'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 99.0, 'volume': 21}
+
+def test_revised_minute_bar_is_not_counted_twice():
+    aggregator = BarAggregator(timeframes=('1m', '1h', '1d'))
+    aggregator.add_bar('SPY', ts(10, 0), 100.0, 101.0, 99.0, 100.5, 1000)
+    aggregator.add_bar('SPY', ts(10, 1), 100.5, 101.0, 100.0, 100.8, 500)
+    aggregator.add_bar('SPY', ts(10, 1), 100.5, 102.0, 100.0, 101.5, 800)
+
+    assert aggregator.current('SPY', '1m') == {'t': ts(10, 1), 'open': 100.5, 'high': 102.0, 'low': 100.0, 'close': 101.5, 'volume': 800}
+    assert aggregator.current('SPY', '1h')['volume'] == 1800
+    assert aggregator.current('SPY', '1d')['high'] == 102.0
+
+def test_daily_bar_resets_at_session_boundary():
+    aggregator = BarAggregator(timeframes=('1d',))
+    aggregator.add_bar('SPY', ts(15, 59), 100.0, 101.0, 99.0, 100.5, 1000)
+    aggregator.add_bar('SPY', ts(9, 30, day=19), 102.0, 103.0, 101.0, 102.5, 200)
+
+    assert aggregator.current('SPY', '1d') == {'t': session_start(ts(9, 30, day=19)), 'open': 102.0, 'high': 103.0, 'low': 101.0, 'close': 102.5, 'volume': 200}
+    assert aggregator.current('AAPL', '1d') is None
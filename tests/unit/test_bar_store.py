@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from src.market_data.bar_store import BarStore
+from src.market_data.executor import MarketDataTimeout
+
+
+def make_history(start, closes):
+    index = pd.date_range(pd.Timestamp(start, unit='s', tz='UTC'), periods=len(closes), freq='1min')
+    return pd.DataFrame({'Open': closes, 'High': closes, 'Low': closes, 'Close': closes, 'Volume': [100] * len(closes)}, index=index)
+
+def make_store(folder, now, initial, since_calls):
+    def fetch_since(symbol, start):
+        since_calls.append(start)
+        return make_history(start, [12.0, 13.0])
+    return BarStore(folder=str(folder), fetch_since=fetch_since, fetch_initial=lambda symbol: initial,
+                    min_refresh_seconds=0, wall_clock=lambda: now)
+
+
+def test_delta_refresh_overwrites_last_bar_and_appends(tmp_path):
+    now = 1_700_000_000
+    since_calls = []
+    store = make_store(tmp_path, now, make_history(now - 180, [10.0, 11.0, 11.5]), since_calls)
+
+    assert len(store.get_bars('spy')) == 3
+    bars = store.get_bars('SPY')
+
+    # the second refresh only asks for bars from the last stored minute on
+    assert since_calls == [now - 60]
+    assert list(bars['close']) == [10.0, 11.0, 12.0, 13.0]
+
+def test_bars_persist_between_stores(tmp_path):
+    now = 1_700_000_000
+    store = make_store(tmp_path, now, make_history(now - 180, [10.0, 11.0, 11.5]), [])
+    store.get_bars('SPY')
+    store.get_bars('SPY')
+
+    reloaded = make_store(tmp_path, now, None, [])
+    frame = reloaded.get_frame('SPY', refresh=False)
+    assert list(frame.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
+    assert list(frame['close']) == [10.0, 11.0, 12.0, 13.0]
+
+def test_stored_bars_readable_while_refresh_is_slow(tmp_path):
+    now = 1_700_000_000
+    release = threading.Event()
+
+    def slow_since(symbol, start):
+        release.wait(1)
+        return make_history(start, [12.0])
+
+    store = BarStore(folder=str(tmp_path), fetch_since=slow_since, fetch_initial=lambda symbol: make_history(now - 120, [10.0, 11.0]),
+                     min_refresh_seconds=0, wall_clock=lambda: now)
+    store.refresh('SPY')
+
+    with pytest.raises(MarketDataTimeout):
+        store.refresh('SPY', timeout=0.05)
+    assert list(store.get_bars('SPY', refresh=False)['close']) == [10.0, 11.0]
+    release.set()
+
+def test_least_recently_used_symbols_are_evicted(tmp_path):
+    now = 1_700_000_000
+    store = BarStore(folder=str(tmp_path), fetch_since=lambda symbol, start: make_history(start, [12.0]),
+                     fetch_initial=lambda symbol: make_history(now - 120, [10.0, 11.0]),
+                     min_refresh_seconds=60, wall_clock=lambda: now, max_symbols=2)
+    for symbol in ('SPY', 'AAPL', 'SPY', 'MSFT'):
+        store.refresh(symbol)
+
+    assert len(store) == 2
+    # AAPL was evicted, its bars come back from its file
+    assert list(store.get_bars('AAPL', refresh=False)['close']) == [10.0, 11.0]
+    assert len(store) == 2
+
+def test_symbols_being_refreshed_are_not_evicted(tmp_path):
+    now = 1_700_000_000
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_since(symbol, start):
+        started.set()
+        release.wait(1)
+        return make_history(start, [12.0])
+
+    store = BarStore(folder=str(tmp_path), fetch_since=slow_since, fetch_initial=lambda symbol: make_history(now - 120, [10.0, 11.0]),
+                     min_refresh_seconds=0, wall_clock=lambda: now, max_symbols=1)
+    store.refresh('SPY')
+    with pytest.raises(MarketDataTimeout):
+        store.refresh('SPY', timeout=0.05)
+    started.wait(1)
+
+    # SPY stays while its refresh runs, so no second copy appends to its file
+    store.get_bars('AAPL', refresh=False)
+    assert len(store) == 2
+    release.set()
+    time.sleep(0.05)
+    store.get_bars('MSFT', refresh=False)
+    assert len(store) == 1
+    # the still forming last bar was overwritten once, in memory and on disk
+    assert list(store.get_bars('SPY', refresh=False)['close']) == [10.0, 12.0]
+
+def test_only_ticker_symbols_are_stored(tmp_path):
+    store = make_store(tmp_path, 1_700_000_000, None, [])
+
+    assert BarStore.normalize(' brk.b ') == 'BRK.B'
+    for symbol in ('', '   ', '../etc/passwd', 'A' * 13, None):
+        with pytest.raises(ValueError):
+            store.get_bars(symbol, refresh=False)
+    assert len(store) == 0
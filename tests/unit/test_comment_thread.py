@@ -0,0 +1,42 @@
+from app import app
+from src.repositories.post_repository import post_repository_singleton
+from tests.e2e.utils import make_user, reset_db
+
+
+def contents(nodes):
+    return [(node['comment'].content, contents(node['replies'])) for node in nodes]
+
+def test_comment_thread_is_a_tree():
+    with app.app_context():
+        reset_db()
+        user = make_user('commenter')
+        post = post_repository_singleton.create_post(title='Thread', content='Content', user_id=user.user_id)
+        first = post_repository_singleton.add_comment(user.user_id, post.post_id, 'First')
+        second = post_repository_singleton.add_comment(user.user_id, post.post_id, 'Second')
+        reply = post_repository_singleton.add_comment(user.user_id, post.post_id, 'Reply', first.comment_id)
+        post_repository_singleton.add_comment(user.user_id, post.post_id, 'Nested', reply.comment_id)
+        post_repository_singleton.add_comment(user.user_id, post.post_id, 'Other reply', second.comment_id)
+
+        thread, cursor = post_repository_singleton.get_comment_thread(post.post_id)
+
+        assert contents(thread) == [
+            ('First', [('Reply', [('Nested', [])])]),
+            ('Second', [('Other reply', [])]),
+        ]
+        assert all(node['creator'].user_id == user.user_id for node in thread)
+        assert cursor is None
+
+def test_comment_thread_pages_by_top_level_comment():
+    with app.app_context():
+        reset_db()
+        user = make_user('commenter')
+        post = post_repository_singleton.create_post(title='Thread', content='Content', user_id=user.user_id)
+        for i in range(5):
+            comment = post_repository_singleton.add_comment(user.user_id, post.post_id, f'Comment {i}')
+            post_repository_singleton.add_comment(user.user_id, post.post_id, f'Reply {i}', comment.comment_id)
+
+        first, cursor = post_repository_singleton.get_comment_thread(post.post_id, limit=3)
+        second, last_cursor = post_repository_singleton.get_comment_thread(post.post_id, cursor, limit=3)
+
+        assert contents(first + second) == [(f'Comment {i}', [(f'Reply {i}', [])]) for i in range(5)]
+        assert last_cursor is None
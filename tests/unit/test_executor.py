@@ -0,0 +1,50 @@
+import time
+import threading
+
+import gevent
+import pytest
+from src.market_data.executor import MarketDataBusy, MarketDataExecutor, MarketDataTimeout
+
+
+def test_run_returns_result():
+    executor = MarketDataExecutor(max_workers=2, max_pending=0)
+
+    assert executor.run(lambda a, b: a + b, 1, 2, timeout=1) == 3
+
+def test_run_times_out_without_waiting_for_the_call():
+    executor = MarketDataExecutor(max_workers=1, max_pending=0)
+    release = threading.Event()
+
+    with pytest.raises(MarketDataTimeout):
+        executor.run(release.wait, 5, timeout=0.05)
+    release.set()
+
+def test_submit_rejects_when_full():
+    executor = MarketDataExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+    running = executor.submit(release.wait, 5)
+    queued = executor.submit(release.wait, 5)
+
+    with pytest.raises(MarketDataBusy):
+        executor.submit(release.wait, 5)
+
+    release.set()
+    running.result(1)
+    queued.result(1)
+    # finished calls give their slot back
+    assert executor.run(lambda: 'ok', timeout=1) == 'ok'
+
+def test_run_lets_other_greenlets_run_while_waiting():
+    executor = MarketDataExecutor(max_workers=1, max_pending=0)
+    ticks = []
+
+    def tick():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            gevent.sleep(0.01)
+
+    ticker = gevent.spawn(tick)
+    assert executor.run(time.sleep, 0.2, timeout=1) is None
+    # the ticker finished while the call was still sleeping on its thread
+    assert len(ticks) == 5
+    ticker.join()
@@ -0,0 +1,128 @@
+from app import app
+from src.models import HomeTimeline
+from src.repositories.post_repository import post_repository_singleton
+from src.repositories.timeline_repository import TimelineRepository, timeline_repository_singleton
+from src.repositories.user_repository import user_repository_singleton
+from tests.e2e.utils import make_user, reset_db
+
+
+def test_following_feed_pages_newest_first():
+    with app.app_context():
+        reset_db()
+        reader = make_user('reader')
+        followed = make_user('followed')
+        stranger = make_user('stranger')
+        user_repository_singleton.follow_user(reader.user_id, followed.user_id)
+        for i in range(5):
+            post_repository_singleton.create_post(title=f'Followed {i}', content='Content', user_id=followed.user_id)
+        post_repository_singleton.create_post(title='Stranger', content='Content', user_id=stranger.user_id)
+
+        first, cursor = post_repository_singleton.get_all_posts_of_followed_users(reader.user_id, limit=3)
+        second, last_cursor = post_repository_singleton.get_all_posts_of_followed_users(reader.user_id, cursor, limit=3)
+
+        titles = [post.title for post, _ in first + second]
+        assert titles == [f'Followed {i}' for i in range(4, -1, -1)]
+        assert all(creator.user_id == followed.user_id for _, creator in first + second)
+        assert last_cursor is None
+
+def test_following_feed_empty_without_follows():
+    with app.app_context():
+        reset_db()
+        reader = make_user('reader')
+
+        assert post_repository_singleton.get_all_posts_of_followed_users(reader.user_id) == ([], None)
+        assert reader.get_all_following() == []
+
+def test_global_feed_pages_do_not_overlap():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        for i in range(7):
+            post_repository_singleton.create_post(title=f'Post {i}', content='Content', user_id=author.user_id)
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = post_repository_singleton.get_posts_page(cursor, limit=3)
+            seen += [post.title for post, _ in page]
+            if cursor is None:
+                break
+
+        assert seen == [f'Post {i}' for i in range(6, -1, -1)]
+
+def test_home_timeline_follows_and_unfollows():
+    with app.app_context():
+        reset_db()
+        reader = make_user('reader')
+        followed = make_user('followed')
+        for i in range(3):
+            post_repository_singleton.create_post(title=f'Before {i}', content='Content', user_id=followed.user_id)
+        # following backfills the posts written before the follow, new posts are fanned out
+        user_repository_singleton.follow_user(reader.user_id, followed.user_id)
+        post_repository_singleton.create_post(title='After', content='Content', user_id=followed.user_id)
+
+        page, _ = timeline_repository_singleton.get_feed(reader.user_id, limit=3)
+        assert [post.title for post, _ in page] == ['After', 'Before 2', 'Before 1']
+
+        user_repository_singleton.follow_user(reader.user_id, followed.user_id)
+        assert HomeTimeline.query.filter_by(user_id=reader.user_id).count() == 0
+        assert post_repository_singleton.get_all_posts_of_followed_users(reader.user_id) == ([], None)
+
+def test_home_timeline_merges_celebrity_posts():
+    with app.app_context():
+        reset_db()
+        reader = make_user('reader')
+        friend = make_user('friend')
+        celebrity = make_user('celebrity')
+        user_repository_singleton.follow_user(reader.user_id, friend.user_id)
+        user_repository_singleton.follow_user(reader.user_id, celebrity.user_id)
+        user_repository_singleton.follow_user(friend.user_id, celebrity.user_id)
+        for title, author in [('Friend 0', friend), ('Friend 1', friend), ('Celebrity 0', celebrity), ('Friend 2', friend)]:
+            post_repository_singleton.create_post(title=title, content='Content', user_id=author.user_id)
+        # with two followers the celebrity's posts are not fanned out
+        timelines = TimelineRepository(enabled=True, celebrity_followers=2)
+        HomeTimeline.query.filter_by(author_id=celebrity.user_id).delete()
+
+        first, cursor = timelines.get_feed(reader.user_id, limit=2)
+        assert [post.title for post, _ in first] == ['Friend 2', 'Celebrity 0']
+        # one friend post left is not a full page, the join query serves the rest
+        assert timelines.get_feed(reader.user_id, cursor, limit=2) is None
+        second, last_cursor = post_repository_singleton.get_all_posts_of_followed_users(reader.user_id, cursor, limit=2)
+        assert [post.title for post, _ in second] == ['Friend 1', 'Friend 0']
+        assert last_cursor is None
+
+def test_home_timeline_pages_past_capacity_with_join_query():
+    with app.app_context():
+        reset_db()
+        reader = make_user('reader')
+        followed = make_user('followed')
+        user_repository_singleton.follow_user(reader.user_id, followed.user_id)
+        posts = [post_repository_singleton.create_post(title=f'Followed {i}', content='Content', user_id=followed.user_id)
+                 for i in range(5)]
+        # a sampled fan-out trims every follower's timeline, reads never do
+        timelines = TimelineRepository(enabled=True, capacity=3, random=lambda: 0.0)
+        timelines.fan_out(posts[-1])
+        assert HomeTimeline.query.filter_by(user_id=reader.user_id).count() == 3
+
+        first, cursor = timelines.get_feed(reader.user_id, limit=2)
+        assert [post.title for post, _ in first] == ['Followed 4', 'Followed 3']
+        # the second page runs past the three posts the timeline keeps
+        assert timelines.get_feed(reader.user_id, cursor, limit=2) is None
+        second, _ = post_repository_singleton.get_all_posts_of_followed_users(reader.user_id, cursor, limit=2)
+        assert [post.title for post, _ in second] == ['Followed 2', 'Followed 1']
+
+def test_home_timeline_read_does_not_write():
+    with app.app_context():
+        reset_db()
+        reader = make_user('reader')
+        followed = make_user('followed')
+        user_repository_singleton.follow_user(reader.user_id, followed.user_id)
+        post_repository_singleton.create_post(title='Followed', content='Content', user_id=followed.user_id)
+        HomeTimeline.query.delete()
+        timelines = TimelineRepository(enabled=True)
+
+        # an unbuilt timeline is left to the join query instead of being rebuilt on read
+        assert timelines.get_feed(reader.user_id) is None
+        assert HomeTimeline.query.count() == 0
+        assert timelines.rebuild_all() == 1
+        assert HomeTimeline.query.filter_by(user_id=reader.user_id).count() == 1
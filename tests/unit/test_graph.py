@@ -1,9 +1,9 @@
-from app import app
-import yfinance as yf
+from app import app, correct_graph_cols, refresh_bars
+from src.market_data.providers import LocalProvider
 def test_graph():
     ticker = "AAPL"
-    symbol = yf.Ticker(ticker)
-    df = symbol.history(period='1d', interval='1m')
+    provider = LocalProvider(seed=1)
+    df = provider.history(ticker, period='1d', interval='1m')
 
     assert df['Open'].item
     assert df['High'].item
@@ -11,4 +11,20 @@ def test_graph():
     assert df['Close'].item
     assert df['Volume'].item
     assert df['Dividends'].item
-    assert df['Stock Splits'].item
\ No newline at end of file
+    assert df['Stock Splits'].item
+    assert list(correct_graph_cols(df).columns[:6]) == ['date', 'open', 'high', 'low', 'close', 'volume']
+
+def test_replay_serves_stored_bars_without_refreshing(monkeypatch):
+    def refresh(symbol, timeout=None):
+        raise AssertionError('a replay must not call the upstream')
+
+    monkeypatch.setattr('app.MARKET_DATA_MODE', 'replay')
+    monkeypatch.setattr('app.bar_store_singleton.refresh', refresh)
+    refresh_bars('SPY')
+
+def test_chart_routes_reject_invalid_symbols():
+    client = app.test_client()
+
+    assert client.post('/data', json={'Stock': ''}).status_code == 400
+    assert client.post('/data', json={'Stock': '../../etc'}).status_code == 400
+    assert client.get('/indicators?symbol=%3Cscript%3E&studies=sma:20').status_code == 400
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from src.market_data.bar_store import BAR_DTYPE
+from src.market_data.indicators import INDICATORS, Indicator, IndicatorEngine, parse_study
+
+STUDIES = [('sma', (20,)), ('ema', (20,)), ('rsi', (14,)), ('macd', (12, 26, 9)), ('bbands', (20, 2)), ('vwap', ())]
+
+
+def make_bars(count, seed=1):
+    rng = np.random.default_rng(seed)
+    bars = np.empty(count, dtype=BAR_DTYPE)
+    bars['t'] = 1702909800 + 60 * np.arange(count)
+    bars['close'] = 100 + rng.standard_normal(count).cumsum()
+    bars['open'] = bars['close'] + rng.standard_normal(count) * 0.1
+    bars['high'] = np.maximum(bars['open'], bars['close']) + 0.2
+    bars['low'] = np.minimum(bars['open'], bars['close']) - 0.2
+    bars['volume'] = rng.integers(100, 1000, count)
+    return bars
+
+
+@pytest.mark.parametrize('name, params', STUDIES)
+def test_incremental_updates_match_vectorized(name, params):
+    bars = make_bars(300)
+    expected = INDICATORS[name](*params).seed(bars)
+
+    indicator = INDICATORS[name](*params)
+    indicator.seed(bars[:200])
+    for bar in bars[200:]:
+        # every bar is first seen while still forming, then in its final version
+        forming = bar.copy()
+        forming['close'] = bar['open']
+        indicator.update(forming)
+        result = indicator.revise(bar)
+    for output, value in result.items():
+        assert value == pytest.approx(expected[output][-1])
+
+def test_engine_keeps_series_current():
+    bars = make_bars(300)
+    engine = IndicatorEngine()
+    engine.get('SPY', '1m', 'ema', (20,), bars[:250])
+    engine.advance('SPY', '1m', bars[249:])
+    series = engine.get('SPY', '1m', 'ema', (20,), bars[299:])
+
+    assert len(series['t']) == 300
+    assert series['value'][:19] == [None] * 19
+    assert series['value'][-1] == pytest.approx(INDICATORS['ema'](20).seed(bars)['value'][-1])
+
+def test_engine_reseeds_a_series_seeded_without_bars():
+    engine = IndicatorEngine()
+    bars = make_bars(50)
+
+    # the first request came before the symbol's bars were loaded
+    assert engine.get('X', '1m', 'sma', (3,), make_bars(0))['t'] == []
+    series = engine.get('X', '1m', 'sma', (3,), bars)
+
+    assert series['t'] == bars['t'].tolist()
+    assert np.allclose(series['value'][2:], INDICATORS['sma'](3).seed(bars)['value'][2:])
+
+def test_indicators_must_implement_updates():
+    class Incomplete(Indicator):
+        def seed(self, bars):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_parse_study():
+    assert parse_study('MACD:12:26:9') == ('macd', (12, 26, 9))
+    assert parse_study('bbands:20:2.5') == ('bbands', (20, 2.5))
+    assert parse_study('vwap') == ('vwap', ())
+    # periods are whole bars, only the band width may be fractional
+    for study in ('foo:3', 'sma:0', 'sma:20:3', 'ema:x', 'sma:1.5', 'rsi:14.0', 'bbands:20.5:2', 'macd:12:26:9.5', 'bbands:20:nan'):
+        with pytest.raises(ValueError):
+            parse_study(study)
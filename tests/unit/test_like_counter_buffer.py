@@ -0,0 +1,38 @@
+from app import app
+from src.models import Comment, Post
+from src.repositories.like_counter_buffer import LikeCounterBuffer
+from src.repositories.post_repository import post_repository_singleton
+from tests.e2e.utils import make_user, reset_db
+
+
+def test_pending_sums_changes_per_row():
+    buffer = LikeCounterBuffer(enabled=True)
+    buffer.add(Post.__table__, 1, 1)
+    buffer.add(Post.__table__, '1', 1)
+    buffer.add(Comment.__table__, 1, -1)
+
+    assert buffer.pending(Post.__table__, 1) == 2
+    assert buffer.pending(Comment.__table__, 1) == -1
+    assert buffer.pending(Post.__table__, 2) == 0
+
+def test_flush_skips_changes_that_cancel_out():
+    buffer = LikeCounterBuffer(enabled=True)
+    buffer.add(Post.__table__, 1, 1)
+    buffer.add(Post.__table__, 1, -1)
+
+    with app.app_context():
+        assert buffer.flush() == 0
+    assert buffer.pending(Post.__table__, 1) == 0
+
+def test_flush_writes_the_counters():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        post = post_repository_singleton.create_post(title='Hot', content='Content', user_id=author.user_id)
+        buffer = LikeCounterBuffer(enabled=True)
+        for _ in range(3):
+            buffer.add(Post.__table__, post.post_id, 1)
+
+        assert buffer.flush() == 1
+        assert buffer.pending(Post.__table__, post.post_id) == 0
+        assert Post.query.get(post.post_id).likes == 3
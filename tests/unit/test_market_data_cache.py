@@ -0,0 +1,114 @@
+import threading
+import time
+
+import gevent
+import pytest
+from src.market_data.cache import MarketDataCache
+from src.market_data.executor import MarketDataTimeout
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_within_ttl():
+    calls = []
+    clock = FakeClock()
+    cache = MarketDataCache(fetcher=lambda *key: calls.append(key) or len(calls), clock=clock)
+
+    assert cache.get_history('aapl', '5d', '1m') == 1
+    clock.now += 2
+    assert cache.get_history('AAPL', '5d', '1m') == 1
+    assert calls == [('AAPL', '5d', '1m')]
+
+def test_lru_eviction():
+    cache = MarketDataCache(fetcher=lambda *key: key[0], max_entries=2)
+    cache.get_history('AAPL', '1y', '1d')
+    cache.get_history('MSFT', '1y', '1d')
+    cache.get_history('AAPL', '1y', '1d')
+    cache.get_history('TSLA', '1y', '1d')
+
+    assert len(cache) == 2
+    assert cache.peek(('MSFT', '1y', '1d')) is None
+    assert cache.peek(('AAPL', '1y', '1d')) == 'AAPL'
+
+def test_concurrent_misses_share_one_fetch():
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(*key):
+        calls.append(key)
+        release.wait(1)
+        return 'bars'
+
+    cache = MarketDataCache(fetcher=slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_history('SPY', '5d', '1m'))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['bars'] * 10
+
+def test_stale_value_served_when_refresh_fails():
+    clock = FakeClock()
+    responses = ['bars']
+
+    def flaky_fetch(*key):
+        if not responses:
+            raise ConnectionError('rate limited')
+        return responses.pop()
+
+    cache = MarketDataCache(fetcher=flaky_fetch, stale_ttl=0, clock=clock)
+    assert cache.get_history('SPY', '5d', '1m') == 'bars'
+    clock.now += 600
+    assert cache.get_history('SPY', '5d', '1m') == 'bars'
+
+def test_batch_fetch_only_requests_missing_symbols():
+    batches = []
+
+    def batch_fetch(symbols, period, interval):
+        batches.append(symbols)
+        return {symbol: symbol.lower() for symbol in symbols if symbol != 'NOPE'}
+
+    cache = MarketDataCache(fetcher=lambda *key: key[0].lower(), batch_fetcher=batch_fetch)
+    cache.get_history('AAPL', '5d', '1d')
+    frames = cache.get_history_many(['AAPL', 'msft', 'TSLA', 'NOPE'], '5d', '1d')
+
+    assert batches == [['MSFT', 'TSLA', 'NOPE']]
+    assert frames == {'AAPL': 'aapl', 'MSFT': 'msft', 'TSLA': 'tsla'}
+
+def test_slow_fetch_times_out_then_fills_cache():
+    release = threading.Event()
+
+    def slow_fetch(*key):
+        release.wait(1)
+        return 'bars'
+
+    cache = MarketDataCache(fetcher=slow_fetch, timeout=0.05)
+    with pytest.raises(MarketDataTimeout):
+        cache.get_history('SPY', '5d', '1m')
+
+    # the fetch keeps running on the pool and its result serves the next request
+    release.set()
+    time.sleep(0.05)
+    assert cache.get_history('SPY', '5d', '1m') == 'bars'
+
+def test_waiting_for_a_fetch_does_not_block_other_greenlets():
+    def slow_fetch(*key):
+        time.sleep(0.2)
+        return 'bars'
+
+    cache = MarketDataCache(fetcher=slow_fetch, timeout=1)
+    ticker = gevent.spawn(lambda: [gevent.sleep(0.01) for _ in range(5)])
+
+    assert cache.get_history('SPY', '5d', '1m') == 'bars'
+    assert ticker.dead
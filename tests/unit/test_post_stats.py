@@ -0,0 +1,99 @@
+from datetime import datetime
+from flask import render_template
+from app import app
+from src.models import Post, users
+from src.repositories.post_repository import post_repository_singleton
+from tests.e2e.utils import make_user, reset_db
+
+
+def test_post_stats_for_a_page():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        viewer = make_user('viewer')
+        busy = post_repository_singleton.create_post(title='Busy', content='Content', user_id=author.user_id)
+        quiet = post_repository_singleton.create_post(title='Quiet', content='Content', user_id=author.user_id)
+        comment = post_repository_singleton.add_comment(viewer.user_id, busy.post_id, 'First')
+        post_repository_singleton.add_comment(author.user_id, busy.post_id, 'Reply', comment.comment_id)
+        post_repository_singleton.add_like(busy.post_id, viewer.user_id)
+        post_repository_singleton.add_like(busy.post_id, author.user_id)
+
+        stats = post_repository_singleton.get_post_stats([busy.post_id, quiet.post_id], viewer.user_id)
+
+        assert stats[busy.post_id] == {'likes': 2, 'comments': 2, 'liked': True}
+        assert stats[quiet.post_id] == {'likes': 0, 'comments': 0, 'liked': False}
+
+def test_post_stats_without_posts():
+    with app.app_context():
+        assert post_repository_singleton.get_post_stats([], 1) == {}
+
+def test_liked_ids_only_cover_the_rendered_ids():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        viewer = make_user('viewer')
+        liked = post_repository_singleton.create_post(title='Liked', content='Content', user_id=author.user_id)
+        other = post_repository_singleton.create_post(title='Other', content='Content', user_id=author.user_id)
+        comment = post_repository_singleton.add_comment(author.user_id, liked.post_id, 'Comment')
+        unrendered = post_repository_singleton.add_comment(author.user_id, other.post_id, 'Elsewhere')
+        post_repository_singleton.add_like(liked.post_id, viewer.user_id)
+        post_repository_singleton.add_like_to_comment(comment.comment_id, viewer.user_id)
+        post_repository_singleton.add_like_to_comment(unrendered.comment_id, viewer.user_id)
+
+        post_ids, comment_ids = post_repository_singleton.get_liked_ids(viewer.user_id, [liked.post_id, other.post_id], [comment.comment_id])
+
+        assert post_ids == {liked.post_id}
+        assert comment_ids == {comment.comment_id}
+        assert post_repository_singleton.get_liked_ids(author.user_id, [liked.post_id], [comment.comment_id]) == (set(), set())
+
+def test_like_toggles_and_returns_the_count():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        viewer = make_user('viewer')
+        post = post_repository_singleton.create_post(title='Post', content='Content', user_id=author.user_id)
+        comment = post_repository_singleton.add_comment(author.user_id, post.post_id, 'Comment')
+
+        assert post_repository_singleton.add_like(post.post_id, viewer.user_id) == {'liked': True, 'likes': 1}
+        assert post_repository_singleton.add_like(post.post_id, author.user_id) == {'liked': True, 'likes': 2}
+        assert post_repository_singleton.add_like(post.post_id, viewer.user_id) == {'liked': False, 'likes': 1}
+        assert post_repository_singleton.add_like_to_comment(comment.comment_id, viewer.user_id) == {'liked': True, 'likes': 1}
+        assert post_repository_singleton.add_like_to_comment(comment.comment_id, viewer.user_id) == {'liked': False, 'likes': 0}
+        assert post_repository_singleton.add_like(post.post_id + 1000, viewer.user_id) is None
+
+def test_profile_posts_are_liked_as_the_viewer():
+    owner = users('Profile', 'Owner', 'owner', 'owner@test.com', 'Test123', 'default-profile-pic.jpg')
+    viewer = users('Test', 'Viewer', 'viewer', 'viewer@test.com', 'Test123', 'default-profile-pic.jpg')
+    owner.user_id, viewer.user_id = 1, 2
+    post = Post(owner.user_id, 'Title', 'Content')
+    post.post_id, post.date_posted = 7, datetime.now()
+
+    with app.test_request_context():
+        html = render_template('posts_content.html', posts=[(post, owner)], user=owner, viewer=viewer,
+                               post_stats={7: {'likes': 1, 'comments': 0, 'liked': True}})
+
+    # the heart and the like it records both belong to the viewer, not the profile owner
+    assert 'data-user-id="2"' in html
+    assert 'Posted by you' not in html
+
+def test_like_route_takes_the_ids_as_form_strings():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        viewer = make_user('viewer')
+        post = post_repository_singleton.create_post(title='Post', content='Content', user_id=author.user_id)
+        comment = post_repository_singleton.add_comment(author.user_id, post.post_id, 'Comment')
+        client = app.test_client()
+
+        response = client.post('/posts/like', data={'post_id': str(post.post_id), 'user_id': str(viewer.user_id)})
+        assert response.get_json() == {'status': 'success', 'liked': True, 'likes': 1}
+        response = client.post('/posts/like_comment', data={'comment_id': str(comment.comment_id), 'user_id': str(viewer.user_id)})
+        assert response.get_json() == {'status': 'success', 'liked': True, 'likes': 1}
+        assert client.post('/posts/like', data={'post_id': str(post.post_id + 1000), 'user_id': str(viewer.user_id)}).status_code == 404
+
+def test_like_routes_reject_ids_that_are_not_numbers():
+    client = app.test_client()
+
+    assert client.post('/posts/like', data={'post_id': 'abc', 'user_id': '1'}).status_code == 400
+    assert client.post('/posts/like', data={'post_id': '1', 'user_id': ''}).status_code == 400
+    assert client.post('/posts/like_comment', data={'comment_id': '1.5', 'user_id': '1'}).status_code == 400
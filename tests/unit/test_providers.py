@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+from src.market_data.providers import HISTORY_COLUMNS, LocalProvider, MarketDataProvider, make_provider
+
+
+def test_random_walk_is_deterministic_and_well_formed():
+    now = 1_700_000_000
+    first = LocalProvider(fixtures='missing/', seed=3, clock=lambda: now).history('SPY', period='5d', interval='1m')
+    second = LocalProvider(fixtures='missing/', seed=3, clock=lambda: now).history('spy', period='5d', interval='1m')
+    other = LocalProvider(fixtures='missing/', seed=3, clock=lambda: now).history('AAPL', period='5d', interval='1m')
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first['Close'].equals(other['Close'])
+    assert tuple(first.columns) == HISTORY_COLUMNS
+    assert first.index.name == 'Datetime'
+    assert len(first) == 5 * 24 * 60
+    assert (first['High'] >= first[['Open', 'Close']].max(axis=1)).all()
+    assert (first['Low'] <= first[['Open', 'Close']].min(axis=1)).all()
+
+def test_random_walk_grows_with_the_clock():
+    clock = [1_700_000_000]
+    provider = LocalProvider(fixtures='missing/', clock=lambda: clock[0])
+    before = provider.history('SPY', period='1d', interval='1m')
+    clock[0] += 180
+    after = provider.history('SPY', start=before.index[-1].timestamp(), interval='1m')
+
+    # the bars already served do not change, new ones are appended
+    assert after.index[0] == before.index[-1]
+    assert after['Close'].iloc[0] == before['Close'].iloc[-1]
+    assert len(after) == 4
+
+def test_fixture_files_are_served(tmp_path):
+    pd.DataFrame({
+        'Date': ['2024-01-02', '2024-01-03', '2024-01-04'],
+        'Open': [10.0, 11.0, 12.0],
+        'High': [11.0, 12.0, 13.0],
+        'Low': [9.0, 10.0, 11.0],
+        'Close': [10.5, 11.5, 12.5],
+        'Volume': [100, 200, 300],
+    }).to_csv(tmp_path / 'ACME_1d.csv', index=False)
+    provider = LocalProvider(fixtures=str(tmp_path))
+
+    df = provider.history('ACME', period='1d', interval='1d')
+    assert list(df['Close']) == [12.5]
+    assert provider.latest_quote('acme') == {'currentPrice': 12.5, 'openPrice': 12.0}
+    quotes = provider.batch_quotes(['ACME', 'SPY'])
+    assert quotes['ACME']['currentPrice'] == 12.5
+    assert quotes['SPY'] is not None
+
+def test_sample_fixture_is_served_by_default():
+    # the default fixtures folder, relative to the repository root like the tests run
+    df = LocalProvider().history('sample', period='1mo', interval='1d')
+
+    assert df.index.name == 'Date'
+    assert str(df.index.tz) == 'America/New_York'
+    assert len(df) == 10
+    assert (df['Close'].iloc[0], df['Close'].iloc[-1]) == (100.8, 103.8)
+    assert (df['Dividends'] == 0).all()
+
+def test_providers_must_implement_history():
+    class Silent(MarketDataProvider):
+        name = 'silent'
+
+    with pytest.raises(TypeError):
+        Silent()
+
+def test_unknown_provider():
+    with pytest.raises(ValueError):
+        make_provider('bloomberg')
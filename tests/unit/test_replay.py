@@ -0,0 +1,49 @@
+import pytest
+from src.market_data.replay import TickRecorder, TickReplayer, read_tick_log
+
+
+def bar(t, close, volume):
+    return {'t': t, 'open': 10.0, 'high': max(10.0, close), 'low': min(10.0, close), 'close': close, 'volume': volume}
+
+def record(folder, bars, start=1000.0, step=5.0):
+    clock = [start]
+    recorder = TickRecorder(folder=str(folder), clock=lambda: clock[0])
+    for item in bars:
+        recorder.record('SPY', item)
+        clock[0] += step
+    return recorder
+
+
+def test_recorder_skips_unchanged_bars(tmp_path):
+    record(tmp_path, [bar(60, 10.5, 100), bar(60, 10.5, 100), bar(60, 11.0, 150), bar(120, 11.0, 10)])
+
+    log = read_tick_log(str(tmp_path), 'spy')
+    assert list(log['t']) == [60, 60, 120]
+    assert list(log['close']) == [10.5, 11.0, 11.0]
+    assert list(log['at']) == [1000.0, 1010.0, 1015.0]
+
+def test_replay_keeps_spacing_scaled_by_speed(tmp_path):
+    record(tmp_path, [bar(60, 10.5, 100), bar(60, 11.0, 150), bar(120, 11.0, 10)])
+    sleeps = []
+    published = []
+    replayer = TickReplayer(folder=str(tmp_path), speed=10, loop=False, sleep=sleeps.append)
+
+    assert replayer.replay('SPY', lambda symbol, item: published.append(item), lambda: True) == 3
+    assert sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+    assert published[1] == bar(60, 11.0, 150)
+
+def test_replay_as_fast_as_possible_and_looping(tmp_path):
+    record(tmp_path, [bar(60, 10.5, 100), bar(120, 11.0, 10)])
+    sleeps = []
+    published = []
+    replayer = TickReplayer(folder=str(tmp_path), speed=0, sleep=sleeps.append)
+
+    replayer.replay('SPY', lambda symbol, item: published.append(item['t']), lambda: len(published) < 4)
+    assert set(sleeps) == {0}
+    # the second pass is shifted past the first one
+    assert published == [60, 120, 180, 240]
+
+def test_replay_without_recording(tmp_path):
+    replayer = TickReplayer(folder=str(tmp_path), loop=False, sleep=lambda seconds: None)
+
+    assert replayer.replay('SPY', lambda symbol, item: None, lambda: True) == 0
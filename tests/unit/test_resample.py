@@ -0,0 +1,52 @@
+import pandas as pd
+from src.market_data.resample import downsample_bars, pick_resolution
+
+
+def make_bars(count):
+    return pd.DataFrame({
+        'date': pd.date_range('2023-12-18 14:30', periods=count, freq='1min', tz='UTC'),
+        'open': [float(i) for i in range(count)],
+        'high': [float(i) + 0.5 for i in range(count)],
+        'low': [float(i) - 0.5 for i in range(count)],
+        'close': [float(i) + 0.25 for i in range(count)],
+        'volume': [10] * count,
+    })
+
+
+def test_buckets_keep_ohlcv_semantics():
+    buckets = downsample_bars(make_bars(10), resolution='5m')
+
+    assert len(buckets) == 2
+    first = buckets.iloc[0]
+    assert first['date'] == pd.Timestamp('2023-12-18 14:30', tz='UTC')
+    assert first['open'] == 0.0
+    assert first['high'] == 4.5
+    assert first['low'] == -0.5
+    assert first['close'] == 4.25
+    assert first['volume'] == 50
+
+def test_max_points_picks_finest_fitting_resolution():
+    bars = make_bars(390)
+
+    assert pick_resolution(bars, 400) == '1m'
+    assert pick_resolution(bars, 100) == '5m'
+    assert len(downsample_bars(bars, max_points=30)) <= 30
+
+def test_gaps_do_not_create_empty_buckets():
+    bars = pd.concat([make_bars(5), make_bars(5).assign(date=lambda df: df['date'] + pd.Timedelta(days=1))])
+
+    assert len(downsample_bars(bars, resolution='1h')) == 2
+
+def test_daily_buckets_follow_the_exchange_session():
+    # 09:30 ET and 19:30 ET on a winter day, the after-hours bars are past midnight UTC
+    bars = pd.concat([make_bars(5), make_bars(5).assign(date=lambda df: df['date'] + pd.Timedelta(hours=10))])
+
+    buckets = downsample_bars(bars, resolution='1d')
+    assert len(buckets) == 1
+    assert buckets['date'][0] == pd.Timestamp('2023-12-18 00:00', tz='America/New_York')
+    assert str(buckets['date'].dt.tz) == 'UTC'
+    assert buckets['volume'][0] == 100
+
+    four_hours = downsample_bars(bars, resolution='4h')
+    assert list(four_hours['date']) == [pd.Timestamp('2023-12-18 08:00', tz='America/New_York'),
+                                        pd.Timestamp('2023-12-18 16:00', tz='America/New_York')]
@@ -0,0 +1,33 @@
+from app import app
+from src.models import Post
+from src.repositories.post_repository import post_repository_singleton
+from src.sanitize import HEADLINE_START, HEADLINE_STOP, highlight, sanitize_html
+from tests.e2e.utils import make_user, reset_db
+
+
+def test_sanitize_html_keeps_formatting_and_escapes_scripts():
+    assert sanitize_html('<p><strong>Buy</strong></p>') == '<p><strong>Buy</strong></p>'
+    assert sanitize_html('<script>alert(1)</script>') == '&lt;script&gt;alert(1)&lt;/script&gt;'
+    assert sanitize_html(None) == ''
+
+def test_highlight_escapes_before_marking():
+    title = f'<b>{HEADLINE_START}Tesla{HEADLINE_STOP}</b> & co'
+    body = f'<p>{HEADLINE_START}Tesla{HEADLINE_STOP} &amp; <img src=x onerror=alert(1)></p>'
+
+    assert highlight(title) == '&lt;b&gt;<mark>Tesla</mark>&lt;/b&gt; &amp; co'
+    assert highlight(body, html=True) == '<mark>Tesla</mark> &amp; '
+
+def test_post_html_is_stored_when_written():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        post = post_repository_singleton.create_post(title='Title', content='<em>hi</em><script>x</script>', user_id=author.user_id)
+        assert post.content_html == '<em>hi</em>&lt;script&gt;x&lt;/script&gt;'
+
+        post_repository_singleton.update_post(post.post_id, 'Title', '<strong>edited</strong>', None)
+        assert Post.query.get(post.post_id).html == '<strong>edited</strong>'
+
+        # rows from before content_html are filled by the backfill
+        Post.query.filter_by(post_id=post.post_id).update({'content_html': None})
+        assert post_repository_singleton.backfill_content_html() == 1
+        assert Post.query.get(post.post_id).content_html == '<strong>edited</strong>'
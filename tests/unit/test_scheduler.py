@@ -0,0 +1,137 @@
+from datetime import date, datetime
+
+import pytest
+from src.market_data.aggregator import EXCHANGE_TZ
+from src.market_data.executor import FETCH_TIMEOUT
+from src.market_data.scheduler import (BACKOFF_MAX_SECONDS, BUDGET_WAIT_SECONDS, CLOSED, CLOSED_MAX_SLEEP_SECONDS, EXTENDED, OPEN,
+                                       OPEN_POLL_SECONDS, MarketCalendar, PollScheduler, RequestBudget,
+                                       RequestBudgetExceeded, early_closes, exchange_holidays)
+
+
+def at(*args):
+    return datetime(*args, tzinfo=EXCHANGE_TZ)
+
+
+def test_exchange_holidays_2024():
+    holidays = exchange_holidays(2024)
+
+    assert date(2024, 1, 1) in holidays
+    assert date(2024, 3, 29) in holidays      # Good Friday
+    assert date(2024, 5, 27) in holidays      # Memorial Day
+    assert date(2024, 6, 19) in holidays      # Juneteenth
+    assert date(2024, 11, 28) in holidays     # Thanksgiving
+    assert date(2024, 12, 25) in holidays
+    assert len(holidays) == 10
+    assert early_closes(2024) == {date(2024, 7, 3), date(2024, 11, 29), date(2024, 12, 24)}
+
+def test_weekend_holidays_are_observed():
+    # July 4th 2026 is a Saturday, Christmas 2022 a Sunday
+    assert date(2026, 7, 3) in exchange_holidays(2026)
+    assert date(2022, 12, 26) in exchange_holidays(2022)
+    # New Year's Day 2022 was a Saturday and is not observed on Dec 31st
+    assert date(2021, 12, 31) not in exchange_holidays(2021)
+    assert date(2021, 12, 31) not in exchange_holidays(2022)
+
+def test_market_phases():
+    calendar = MarketCalendar()
+
+    assert calendar.phase(at(2024, 3, 28, 10, 0)) == OPEN
+    assert calendar.phase(at(2024, 3, 28, 8, 0)) == EXTENDED
+    assert calendar.phase(at(2024, 3, 28, 17, 0)) == EXTENDED
+    assert calendar.phase(at(2024, 3, 28, 21, 0)) == CLOSED
+    assert calendar.phase(at(2024, 3, 29, 10, 0)) == CLOSED     # Good Friday
+    assert calendar.phase(at(2024, 3, 30, 10, 0)) == CLOSED     # Saturday
+    assert calendar.phase(at(2024, 12, 24, 14, 0)) == EXTENDED  # early close
+
+def test_next_session_start_skips_weekend_and_holiday():
+    calendar = MarketCalendar()
+
+    # Thursday evening before Good Friday, next session is Monday pre-market
+    assert calendar.next_session_start(at(2024, 3, 28, 21, 0)) == at(2024, 4, 1, 4, 0)
+    assert calendar.next_session_start(at(2024, 4, 1, 3, 0)) == at(2024, 4, 1, 4, 0)
+
+
+class FixedCalendar:
+
+    def __init__(self, phase, next_start=None):
+        self._phase = phase
+        self._next_start = next_start
+
+    def phase(self, now=None):
+        return self._phase
+
+    def next_session_start(self, now=None):
+        return self._next_start
+
+
+def test_poll_delay_follows_market_phase():
+    assert PollScheduler(FixedCalendar(OPEN), clock=lambda: 0).next_delay('SPY') == OPEN_POLL_SECONDS
+    assert PollScheduler(FixedCalendar(EXTENDED), clock=lambda: 0).next_delay('SPY') > OPEN_POLL_SECONDS
+
+    now = at(2024, 3, 30, 12, 0).timestamp()
+    closed = PollScheduler(FixedCalendar(CLOSED, at(2024, 4, 1, 4, 0)), clock=lambda: now)
+    assert closed.next_delay('SPY') == CLOSED_MAX_SLEEP_SECONDS
+
+    soon = PollScheduler(FixedCalendar(CLOSED, at(2024, 4, 1, 4, 0)), clock=lambda: at(2024, 4, 1, 3, 59).timestamp())
+    assert soon.next_delay('SPY') == 60
+
+def test_poll_delay_backs_off_after_failures():
+    scheduler = PollScheduler(FixedCalendar(OPEN), clock=lambda: 0)
+
+    delays = []
+    for _ in range(3):
+        scheduler.record_failure('SPY')
+        delays.append(scheduler.next_delay('SPY'))
+    assert delays[0] < delays[1] < delays[2]
+    # other symbols are not affected
+    assert scheduler.next_delay('AAPL') == OPEN_POLL_SECONDS
+
+    for _ in range(20):
+        scheduler.record_failure('SPY')
+    assert scheduler.next_delay('SPY') <= BACKOFF_MAX_SECONDS * 1.2
+
+    scheduler.record_success('SPY')
+    assert scheduler.next_delay('SPY') == OPEN_POLL_SECONDS
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_request_budget_allows_burst_then_paces():
+    clock = FakeClock()
+    budget = RequestBudget(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        budget.acquire()
+    assert clock.now == 0
+
+    budget.acquire()
+    assert clock.now == pytest.approx(0.5)
+
+def test_request_budget_gives_up_after_timeout():
+    clock = FakeClock()
+    budget = RequestBudget(rate=0.1, burst=1, clock=clock, sleep=clock.sleep)
+    budget.acquire()
+
+    with pytest.raises(RequestBudgetExceeded):
+        budget.acquire(timeout=1)
+
+def test_request_budget_fails_fast_within_the_fetch_deadline():
+    clock = FakeClock()
+    budget = RequestBudget(rate=0.01, burst=1, clock=clock, sleep=clock.sleep)
+    budget.acquire()
+
+    # the next token is 100s away, nobody sleeps for it
+    with pytest.raises(RequestBudgetExceeded):
+        budget.acquire()
+    assert clock.now == 0
+    assert BUDGET_WAIT_SECONDS <= FETCH_TIMEOUT
@@ -0,0 +1,38 @@
+from app import app
+from src.repositories.post_repository import post_repository_singleton
+from tests.e2e.utils import make_user, reset_db
+
+
+def test_search_ranks_titles_first_and_finds_comments():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        in_body = post_repository_singleton.create_post(title='Earnings week', content='<p>Watching nvidia closely</p>', user_id=author.user_id)
+        in_title = post_repository_singleton.create_post(title='Nvidia breaks out', content='<p>Volume is up</p>', user_id=author.user_id)
+        post_repository_singleton.create_post(title='Unrelated', content='<p>Bonds</p>', user_id=author.user_id)
+        comment = post_repository_singleton.add_comment(author.user_id, in_body.post_id, 'Nvidia guidance was strong')
+
+        results, has_next = post_repository_singleton.search('nvidia')
+
+        assert [(result['kind'], result['post_id']) for result in results][0] == ('post', in_title.post_id)
+        assert {(result['kind'], result['post_id'], result['comment_id']) for result in results} == {
+            ('post', in_title.post_id, None),
+            ('post', in_body.post_id, None),
+            ('comment', in_body.post_id, comment.comment_id),
+        }
+        assert '<mark>Nvidia</mark>' in results[0]['title']
+        assert not has_next
+
+def test_search_pages():
+    with app.app_context():
+        reset_db()
+        author = make_user('author')
+        for i in range(5):
+            post_repository_singleton.create_post(title=f'Dividend {i}', content='Content', user_id=author.user_id)
+
+        first, has_more = post_repository_singleton.search('dividend', page=1, limit=3)
+        second, has_even_more = post_repository_singleton.search('dividend', page=2, limit=3)
+
+        assert len(first) == 3 and has_more
+        assert len(second) == 2 and not has_even_more
+        assert {result['post_id'] for result in first}.isdisjoint(result['post_id'] for result in second)
@@ -0,0 +1,47 @@
+import pytest
+from src.market_data.subscriptions import SubscriptionManager, TooManySubscriptions
+
+
+def test_one_poller_per_symbol():
+    manager = SubscriptionManager()
+    assert manager.subscribe('sid1', 'SPY') is True
+    assert manager.subscribe('sid2', 'SPY') is False
+    assert manager.subscribe('sid2', 'AAPL') is True
+    assert manager.subscriber_count('SPY') == 2
+    assert sorted(manager.watched_symbols()) == ['AAPL', 'SPY']
+
+def test_poller_stops_after_last_subscriber():
+    manager = SubscriptionManager()
+    manager.subscribe('sid1', 'SPY')
+    manager.subscribe('sid2', 'SPY')
+    manager.unsubscribe('sid1', 'SPY')
+    assert manager.keep_polling('SPY') is True
+    manager.remove_client('sid2')
+    assert manager.keep_polling('SPY') is False
+    # a new subscriber has to start a fresh poller
+    assert manager.subscribe('sid3', 'SPY') is True
+
+def test_normalize_symbol():
+    assert SubscriptionManager.normalize(' spy ') == 'SPY'
+    assert SubscriptionManager.normalize('') is None
+    assert SubscriptionManager.normalize(None) is None
+    assert SubscriptionManager.normalize('brk.b') == 'BRK.B'
+    assert SubscriptionManager.normalize('^GSPC') == '^GSPC'
+    for symbol in ('SPY; DROP', '../etc', 'A' * 13, 42, ['SPY']):
+        assert SubscriptionManager.normalize(symbol) is None
+
+def test_subscriptions_are_capped():
+    manager = SubscriptionManager(max_polled=2, max_per_client=2)
+    assert manager.subscribe('sid1', 'SPY') is True
+    assert manager.subscribe('sid1', 'AAPL') is True
+    with pytest.raises(TooManySubscriptions):
+        manager.subscribe('sid1', 'MSFT')
+    # nothing left of the refused subscription, and joining a polled symbol is always fine
+    with pytest.raises(TooManySubscriptions):
+        manager.subscribe('sid2', 'MSFT')
+    assert manager.subscribe('sid2', 'SPY') is False
+    assert manager.watched_symbols() == ['SPY', 'AAPL']
+
+    manager.remove_client('sid1')
+    manager.keep_polling('AAPL')
+    assert manager.subscribe('sid2', 'MSFT') is True
@@ -0,0 +1,53 @@
+from src.market_data.symbols import SymbolIndex, load_listings
+
+LISTINGS = [
+    ('AAPL', 'Apple Inc.'),
+    ('AMAT', 'Applied Materials, Inc.'),
+    ('APP', 'AppLovin Corporation'),
+    ('DIS', 'The Walt Disney Company'),
+    ('WMT', 'Walmart Inc.'),
+]
+
+
+def symbols(results):
+    return [result['symbol'] for result in results]
+
+
+def test_exact_ticker_then_ticker_prefix_then_name():
+    index = SymbolIndex(LISTINGS)
+
+    assert symbols(index.search('app')) == ['APP', 'AAPL', 'AMAT']
+    assert symbols(index.search('AP')) == ['APP', 'AAPL', 'AMAT']
+    assert index.search('aapl') == [{'symbol': 'AAPL', 'name': 'Apple Inc.'}]
+
+def test_matches_any_word_of_the_name():
+    index = SymbolIndex(LISTINGS)
+
+    assert symbols(index.search('disney')) == ['DIS']
+    assert symbols(index.search('walt d')) == ['DIS']
+    assert symbols(index.search('wal')) == ['DIS', 'WMT']
+    assert index.search('zzz') == []
+    assert index.search('  ') == []
+
+def test_watch_counts_break_ties():
+    index = SymbolIndex(LISTINGS, popularity_loader=lambda: {'amat': 3, 'AAPL': 1})
+
+    assert symbols(index.search('a')) == ['AMAT', 'AAPL', 'APP']
+    assert symbols(index.search('a', limit=1)) == ['AMAT']
+
+def test_popularity_is_reloaded_after_ttl():
+    clock = [0.0]
+    counts = {'AAPL': 1}
+    index = SymbolIndex(LISTINGS, popularity_loader=lambda: dict(counts), popularity_ttl=60, clock=lambda: clock[0])
+
+    assert symbols(index.search('a'))[0] == 'AAPL'
+    counts['APP'] = 5
+    assert symbols(index.search('a'))[0] == 'AAPL'
+    clock[0] = 61
+    assert symbols(index.search('a'))[0] == 'APP'
+
+def test_bundled_listings_load():
+    index = SymbolIndex(load_listings())
+
+    assert symbols(index.search('spy'))[0] == 'SPY'
+    assert index.name('msft') == 'Microsoft Corporation'
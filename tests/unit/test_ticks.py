@@ -0,0 +1,26 @@
+from src.market_data.ticks import TickPublisher, make_tick
+
+
+def make_bar(t, close, volume=100.0):
+    return {'t': t, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': close, 'volume': volume}
+
+
+def test_tick_only_carries_changed_fields():
+    assert make_tick(make_bar(60, 1.5)) == {'t': 60, 'o': 1.0, 'h': 2.0, 'l': 0.5, 'c': 1.5, 'v': 100.0}
+    assert make_tick(make_bar(60, 1.75), make_bar(60, 1.5)) == {'t': 60, 'c': 1.75}
+    assert make_tick(make_bar(60, 1.5), make_bar(60, 1.5)) is None
+
+def test_ticks_in_one_cycle_are_coalesced():
+    publisher = TickPublisher()
+    publisher.publish('SPY', make_bar(60, 1.5))
+    publisher.publish('SPY', make_bar(60, 1.75, 150.0))
+    publisher.publish('SPY', make_bar(60, 1.75, 150.0))
+    publisher.publish('SPY', make_bar(120, 1.8))
+
+    frames = publisher.drain()
+    assert frames == {'SPY': [
+        {'t': 60, 'o': 1.0, 'h': 2.0, 'l': 0.5, 'c': 1.75, 'v': 150.0},
+        {'t': 120, 'o': 1.0, 'h': 2.0, 'l': 0.5, 'c': 1.8, 'v': 100.0},
+    ]}
+    assert publisher.drain() == {}
+    assert publisher.snapshot('SPY')['c'] == 1.8
@@ -0,0 +1,49 @@
+from src.market_data.executor import FETCH_TIMEOUT, MarketDataTimeout
+from src.market_data.warmer import CacheWarmer
+
+
+class FakeCache:
+    def __init__(self):
+        self.batches = []
+
+    def get_history_many(self, symbols, period, interval):
+        self.batches.append((symbols, period, interval))
+        return {}
+
+class FakeBarStore:
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh(self, symbol, timeout=None):
+        self.refreshed.append((symbol, timeout))
+        if symbol == 'TSLA':
+            raise MarketDataTimeout('slow upstream')
+        return True
+
+
+def test_warms_default_and_most_watched_symbols():
+    cache = FakeCache()
+    bar_store = FakeBarStore()
+    warmer = CacheWarmer(lambda limit: ['aapl', 'SPY', 'msft', 'tsla'], cache=cache, bar_store=bar_store, limit=3)
+
+    assert warmer.warm_once() == ['SPY', 'AAPL', 'MSFT']
+    assert cache.batches == [(['SPY', 'AAPL', 'MSFT'], '5d', '1d')]
+    # refreshed on the market data pool, never waited on without a deadline
+    assert bar_store.refreshed == [('SPY', FETCH_TIMEOUT), ('AAPL', FETCH_TIMEOUT), ('MSFT', FETCH_TIMEOUT)]
+
+def test_keeps_warming_after_a_refresh_times_out():
+    bar_store = FakeBarStore()
+    warmer = CacheWarmer(lambda limit: ['TSLA', 'AAPL'], cache=FakeCache(), bar_store=bar_store)
+
+    assert warmer.warm_once() == ['SPY', 'TSLA', 'AAPL']
+    assert [symbol for symbol, _ in bar_store.refreshed] == ['SPY', 'TSLA', 'AAPL']
+
+def test_warms_defaults_when_ranking_fails():
+    def rank(limit):
+        raise RuntimeError('database is down')
+
+    bar_store = FakeBarStore()
+    warmer = CacheWarmer(rank, cache=FakeCache(), bar_store=bar_store)
+
+    assert warmer.warm_once() == ['SPY']
+    assert bar_store.refreshed == [('SPY', FETCH_TIMEOUT)]
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from src.market_data.wire import BINARY_HEADER, to_binary, to_columnar
+
+
+def make_bars():
+    return pd.DataFrame({
+        'date': pd.date_range('2023-12-18 14:30', periods=3, freq='1min', tz='UTC'),
+        'open': [1.0, 2.0, 3.0],
+        'high': [1.5, 2.5, 3.5],
+        'low': [0.5, 1.5, 2.5],
+        'close': [1.25, 2.25, 3.25],
+        'volume': [10, 20, 30],
+    })
+
+
+def test_columnar_uses_epoch_seconds():
+    columnar = to_columnar(make_bars())
+
+    assert list(columnar) == ['t', 'o', 'h', 'l', 'c', 'v']
+    assert columnar['t'] == [1702909800, 1702909860, 1702909920]
+    assert columnar['c'] == [1.25, 2.25, 3.25]
+
+def test_binary_round_trip():
+    payload = to_binary(make_bars())
+    count, version = BINARY_HEADER.unpack_from(payload)
+    columns = np.frombuffer(payload, dtype='<f8', offset=BINARY_HEADER.size).reshape(6, count)
+
+    assert (count, version) == (3, 1)
+    assert columns[0].tolist() == [1702909800, 1702909860, 1702909920]
+    assert columns[5].tolist() == [10, 20, 30]